@@ -0,0 +1,342 @@
+"""
+Benchmark de Cerbero
+Descripción: Genera almacenes sintéticos (1k, 10k y 100k credenciales por
+defecto) y mide por separado las operaciones de PasswordManager: percentiles
+de latencia y pico de memoria. Los resultados se guardan en JSON para poder
+comparar versiones. No usa input()/getpass: trabaja con la API sin prompts.
+
+También mide el arranque de la CLI ('help' y '--version' en un intérprete
+limpio) y comprueba que no carga cryptography ni el portapapeles.
+
+Uso:
+    python benchmark_vault.py [--sizes 1000,10000,100000] [--samples 200]
+                              [--output resultados.json] [--compare anterior.json]
+    python benchmark_vault.py --startup-only
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+import statistics
+import tracemalloc
+
+import cerbero_transfer
+from password_manager import PasswordManager
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+BENCH_PASSWORD = 'benchmark-master-password'
+HERE = os.path.dirname(os.path.abspath(__file__))
+STARTUP_BUDGET_MS = 100
+HEAVY_MODULES = ('cryptography', 'pyperclip', 'cerbero_agent', 'cerbero_audit')
+
+LOADED_SNIPPET = """
+import sys, io, contextlib
+sys.argv = ['password_manager.py', {command!r}]
+with contextlib.redirect_stdout(io.StringIO()):
+    import password_manager
+    password_manager.main()
+print(','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def percentiles(samples):
+    """Resumen de latencias en milisegundos"""
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        'n': len(ordered),
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'p50_ms': pick(0.50),
+        'p90_ms': pick(0.90),
+        'p99_ms': pick(0.99),
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def measure(operation, repeats, setup=None):
+    """Ejecuta operation `repeats` veces; mide latencias y, aparte, el pico de memoria"""
+    samples = []
+    for i in range(repeats):
+        args = setup(i) if setup else ()
+        start = time.perf_counter()
+        operation(*args)
+        samples.append(time.perf_counter() - start)
+    result = percentiles(samples)
+    # Pasada instrumentada separada para que tracemalloc no altere las latencias
+    args = setup(repeats) if setup else ()
+    tracemalloc.start()
+    try:
+        operation(*args)
+        result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def measure_startup(repeats=15):
+    """Arranque de la CLI en un intérprete limpio: tiempo de pared y módulos pesados cargados"""
+    results = {}
+    invocations = {
+        'help': ['password_manager.py', 'help'],
+        '--version': ['password_manager.py', '--version'],
+        # Con -m se usa el bytecode en caché; un script siempre se recompila
+        '-m --version': ['-m', 'password_manager', '--version'],
+    }
+    for label, args in invocations.items():
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *args], cwd=HERE, capture_output=True, check=True)
+            samples.append(time.perf_counter() - start)
+        results[label] = percentiles(samples)
+    for command in ('help', '--version'):
+        loaded = subprocess.run(
+            [sys.executable, '-c', LOADED_SNIPPET.format(command=command, heavy=HEAVY_MODULES)],
+            cwd=HERE, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        results[f'{command} módulos pesados'] = loaded.split(',') if loaded else []
+    return results
+
+
+def synthetic_credentials(size, rng):
+    """Genera (sitio, usuario, contraseña, cuenta) con sitios pequeños y algunos enormes"""
+    shared_sites = ['aws', 'ldap', 'github', 'gcp']
+    for i in range(size):
+        if rng.random() < 0.3:
+            website = rng.choice(shared_sites)
+        else:
+            website = f"site-{rng.randrange(max(1, size // 5)):06d}.example.com"
+        account_name = rng.choice([None, None, 'prod', 'staging', 'personal'])
+        password = ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz0123456789!#$%', k=20))
+        yield website, f"svc-{i:07d}@corp.example", password, account_name
+
+
+def build_manager(directory, kdf):
+    """PasswordManager aislado en un directorio temporal, sin agente ni debounce"""
+    manager = PasswordManager()
+    manager.vault_file = os.path.join(directory, 'vault.enc')
+    manager.salt_file = os.path.join(directory, 'salt.key')
+    manager.use_agent = False
+    manager.save_delay = 0
+    manager.kdf_settings = kdf
+    return manager
+
+
+def bench_size(size, samples, kdf, kdf_repeats, seed):
+    """Mide todas las operaciones sobre un almacén sintético de `size` credenciales"""
+    rng = random.Random(seed)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='cerbero-bench-') as directory:
+        manager = build_manager(directory, kdf)
+        salt = manager.generate_salt()
+        manager.vault_kdf = dict(manager.default_kdf(), salt=salt)
+
+        results['derive_key'] = measure(
+            lambda: manager.derive_key(BENCH_PASSWORD, salt, manager.vault_kdf), kdf_repeats)
+        manager.cipher_key = manager.derive_key(BENCH_PASSWORD, salt, manager.vault_kdf)
+
+        # Almacén inicial escrito en formato segmentado (sin journal)
+        start = time.perf_counter()
+        with manager.batch():
+            for website, username, password, account_name in synthetic_credentials(size, rng):
+                manager.store_credential(website, username, password, account_name)
+        manager.compact_vault()
+        results['generate_seconds'] = time.perf_counter() - start
+        results['vault_bytes'] = os.path.getsize(manager.vault_file)
+
+        results['load_vault'] = measure(manager.load_vault, max(3, kdf_repeats))
+        identities = list(manager._identity_index)
+
+        def save(website, username, account_name, password):
+            # Un cambio hasta que es duradero: registro de journal cifrado + fsync
+            manager.store_credential(website, username, password, account_name, overwrite=True)
+            manager.flush()
+
+        results['save_vault'] = measure(
+            save, samples, setup=lambda i: rng.choice(identities) + (f"rotated-{i}",))
+        results['compact_vault'] = measure(manager.compact_vault, max(3, kdf_repeats))
+        # Comprobar si otro proceso cambió el almacén: sin cambios no se descifra nada
+        results['refresh_unchanged'] = measure(manager.refresh, samples)
+
+        # Las operaciones de credenciales se miden sin esperar a disco
+        with manager.batch():
+            results['add_credential'] = measure(
+                lambda website, username: manager.store_credential(website, username, 'new-password'),
+                samples, setup=lambda i: (rng.choice(['aws', 'bench-new']), f"bench-{i:06d}"))
+
+            def get(website, username, account_name):
+                credential = manager.find_credentials(website, username)[0]
+                with manager.reveal_password(credential) as password:
+                    len(password)
+
+            results['get_credential'] = measure(get, samples, setup=lambda i: rng.choice(identities))
+
+            victims = rng.sample(identities, min(len(identities), samples + 1))
+
+            def delete(website, username, account_name):
+                manager.remove_credential(website, manager._find_credential(website, username, account_name))
+
+            results['delete_credential'] = measure(delete, len(victims) - 1, setup=lambda i: victims[i])
+            manager._pending_ops = []
+
+        def list_all():
+            with contextlib.redirect_stdout(io.StringIO()):
+                manager.list_credentials()
+
+        results['list_credentials'] = measure(list_all, max(3, kdf_repeats))
+
+        # Exportación e importación completas en streaming; la importación va a
+        # un almacén vacío y termina con una sola escritura
+        export_path = os.path.join(directory, 'export.csv')
+
+        def export_csv():
+            with open(export_path, 'w', encoding='utf-8', newline='') as stream:
+                manager.export_credentials(stream, 'csv')
+
+        results['export_csv'] = measure(export_csv, 2)
+
+        def fresh_vault(i):
+            target = os.path.join(directory, f'import-{i}')
+            os.mkdir(target)
+            importer = build_manager(target, kdf)
+            importer.vault_kdf, importer.cipher_key = manager.vault_kdf, manager.cipher_key
+            importer.save_vault()
+            return (importer,)
+
+        def import_csv(importer):
+            with open(export_path, encoding='utf-8', newline='') as stream:
+                importer.import_credentials(cerbero_transfer.read_rows(stream))
+            importer.close()
+
+        results['import_csv'] = measure(import_csv, 2, setup=fresh_vault)
+        manager.close()
+    return results
+
+
+def compare(previous, current):
+    """Imprime la variación de p50 respecto a una ejecución anterior"""
+    print(f"\n📊 Comparación con {previous.get('label') or 'ejecución anterior'} (p50)")
+    for size, operations in current['results'].items():
+        old_operations = previous.get('results', {}).get(size, {})
+        for name, stats in operations.items():
+            old = old_operations.get(name)
+            if not isinstance(stats, dict) or not isinstance(old, dict):
+                continue
+            ratio = stats['p50_ms'] / old['p50_ms'] if old['p50_ms'] else float('inf')
+            flag = '⚠️ ' if ratio > 1.2 else '  '
+            print(f"{flag}{size:>7} {name:<18} {old['p50_ms']:10.3f} → {stats['p50_ms']:10.3f} ms (x{ratio:.2f})")
+
+
+def check_transfer_round_trips(kdf):
+    """
+    Exporta un almacén pequeño en cada formato y lo reimporta en uno vacío: las
+    identidades (incluidas las que solo difieren en la cuenta) y las contraseñas
+    deben coincidir. Las notas de Chrome se ignoran y un JSONL con tipos no
+    válidos se informa fila a fila. Lanza RuntimeError si algo falla (no usa
+    assert: python -O lo eliminaría).
+    """
+    credentials = [('gmail', 'juan', 'p1', 'trabajo'), ('gmail', 'juan', 'p2', 'personal'),
+                   ('aws', 'svc', 'p,"3"', None), ('mi banco', 'ana', 'frase con espacios', None)]
+    with tempfile.TemporaryDirectory(prefix='cerbero-check-') as directory:
+        source = build_manager(directory, kdf)
+        source.vault_kdf = dict(kdf, salt=source.generate_salt())
+        source.cipher_key = source.derive_key(BENCH_PASSWORD, source.vault_kdf['salt'], source.vault_kdf)
+        with source.batch():
+            for website, username, password, account_name in credentials:
+                source.store_credential(website, username, password, account_name)
+        expected = sorted(source.export_rows())
+        for fmt in cerbero_transfer.EXPORT_FORMATS:
+            stream = io.StringIO()
+            source.export_credentials(stream, fmt)
+            stream.seek(0)
+            target = build_manager(os.path.join(directory, fmt), kdf)
+            os.mkdir(os.path.join(directory, fmt))
+            target.vault_kdf, target.cipher_key = source.vault_kdf, source.cipher_key
+            counts, errors = target.import_credentials(cerbero_transfer.read_rows(stream))
+            if counts['added'] != len(credentials) or errors:
+                raise RuntimeError(f"Importación de {fmt}: {counts}, errores {errors}")
+            if sorted(target.export_rows()) != expected:
+                raise RuntimeError(f"Exportar/importar en {fmt} no conserva las credenciales")
+            target.close()
+        # Las notas de una exportación de Chrome (texto libre) no forman parte de la identidad
+        stream = io.StringIO('name,url,username,password,note\n'
+                             'chrome.test,https://chrome.test/,u,pw,codigos de recuperacion\n')
+        source.import_credentials(cerbero_transfer.read_rows(stream))
+        if [c.account_name for c in source.find_credentials('chrome.test')] != [None]:
+            raise RuntimeError("La nota de Chrome se importó como nombre de cuenta")
+        stream = io.StringIO('{"site": "a", "username": "u", "password": 123}\n'
+                             '{"site": "b", "username": "u", "password": null}\n')
+        counts, errors = source.import_credentials(cerbero_transfer.read_rows(stream))
+        if counts['invalid'] != 2 or [line for line, _ in errors] != [1, 2]:
+            raise RuntimeError(f"JSONL con tipos no válidos: {counts}, errores {errors}")
+        source.close()
+
+
+def main():
+    """Función principal del benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark de operaciones del almacén de Cerbero")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Tamaños de almacén separados por comas")
+    parser.add_argument('--samples', type=int, default=200, help="Muestras por operación de credencial")
+    parser.add_argument('--kdf-repeats', type=int, default=3, help="Repeticiones de derive_key/load/compact")
+    parser.add_argument('--iterations', type=int, default=None,
+                        help="Iteraciones de PBKDF2 (por defecto las de PasswordManager)")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--label', default=None, help="Etiqueta de la ejecución (p. ej. versión o commit)")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None, help="JSON de una ejecución anterior")
+    parser.add_argument('--startup-only', action='store_true', help="Medir solo el arranque de la CLI")
+    args = parser.parse_args()
+
+    kdf = {'name': 'pbkdf2-sha256', 'iterations': args.iterations or PasswordManager().iterations}
+    report = {
+        'label': args.label,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'kdf': kdf,
+        'samples': args.samples,
+        'results': {},
+    }
+    check_transfer_round_trips(dict(kdf, iterations=1000))
+    print("✅ Comprobación: exportar/importar en csv, jsonl y chrome conserva las credenciales")
+    print("⏱️  Arranque de la CLI...")
+    report['startup'] = measure_startup()
+    for name, stats in report['startup'].items():
+        if isinstance(stats, dict):
+            flag = '⚠️ ' if stats['p50_ms'] > STARTUP_BUDGET_MS else '  '
+            print(f" {flag}{name:<18} p50 {stats['p50_ms']:10.3f} ms  p90 {stats['p90_ms']:10.3f} ms")
+        else:
+            print(f"   {name:<30} {', '.join(stats) or 'ninguno'}")
+    sizes = [] if args.startup_only else [int(value) for value in args.sizes.split(',')]
+    for size in sizes:
+        print(f"⏱️  Almacén sintético de {size} credenciales...")
+        results = bench_size(size, args.samples, kdf, args.kdf_repeats, args.seed)
+        report['results'][str(size)] = results
+        for name, stats in results.items():
+            if isinstance(stats, dict):
+                print(f"   {name:<18} p50 {stats['p50_ms']:10.3f} ms  p99 {stats['p99_ms']:10.3f} ms  "
+                      f"pico {stats['peak_memory_bytes'] / 1024:10.1f} KiB")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Resultados guardados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Agente de claves de Cerbero
+Descripción: Proceso local (al estilo de ssh-agent) que mantiene en memoria las
+claves Fernet ya derivadas, para que invocaciones repetidas de la CLI no tengan
+que repetir PBKDF2. Escucha en un socket Unix accesible solo por el usuario.
+
+Uso:
+    python cerbero_agent.py start [--timeout SEGUNDOS]
+    python cerbero_agent.py status
+    python cerbero_agent.py lock
+    python cerbero_agent.py stop
+"""
+
+import os
+import sys
+import json
+import stat
+import time
+import socket
+import struct
+import tempfile
+import threading
+import socketserver
+
+DEFAULT_IDLE_TIMEOUT = 900  # Segundos sin uso antes de olvidar una clave
+CLIENT_TIMEOUT = 2.0
+
+
+def private_directory():
+    """Directorio privado del usuario para los sockets de Cerbero"""
+    base = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(base, f"cerbero-{os.getuid()}")
+
+
+def default_socket_path():
+    """Ruta del socket del agente (CERBERO_AGENT_SOCK o directorio privado del usuario)"""
+    return os.environ.get('CERBERO_AGENT_SOCK') or os.path.join(private_directory(), 'agent.sock')
+
+
+def prepare_socket_directory(socket_path):
+    """
+    Comprueba el directorio donde se creará un socket. Solo el directorio
+    privado (cerbero-<uid>) se crea y se deja en 0700; uno indicado por el
+    usuario nunca se modifica: debe existir, ser suyo y no admitir escritura
+    del grupo ni de otros. Lanza PermissionError si no es seguro.
+    """
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    if directory == os.path.abspath(private_directory()):
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        st = os.lstat(directory)
+        if stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid():
+            os.chmod(directory, 0o700)
+    check_socket_directory(directory)
+
+
+def check_socket_directory(directory):
+    """Lanza PermissionError si el directorio no existe, no es del usuario o admite escritura de otros"""
+    try:
+        st = os.lstat(directory)
+    except FileNotFoundError:
+        raise PermissionError(f"El directorio {directory} no existe") from None
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f"El directorio {directory} no pertenece al usuario")
+    if st.st_mode & 0o022:
+        raise PermissionError(f"El directorio {directory} admite escritura de otros usuarios")
+
+
+def socket_trusted(socket_path):
+    """
+    True si se puede confiar en un socket antes de conectarse: su directorio
+    pasa check_socket_directory y el propio socket es del usuario. Sin esto,
+    otro usuario podría crear antes /tmp/cerbero-<uid> y recibir las claves.
+    """
+    try:
+        check_socket_directory(os.path.dirname(os.path.abspath(socket_path)))
+        st = os.lstat(socket_path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid()
+
+
+def peer_uid(sock):
+    """uid del proceso al otro lado de un socket Unix (SO_PEERCRED en Linux) o None si no se conoce"""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', creds)
+    return uid
+
+
+class _KeyStore:
+    """Claves en memoria con caducidad por inactividad"""
+    def __init__(self, idle_timeout):
+        self.idle_timeout = idle_timeout
+        self._keys = {}  # vault_id -> [bytearray clave, timeout, último uso]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _wipe(key):
+        for i in range(len(key)):
+            key[i] = 0
+
+    def add(self, vault_id, key, timeout=None):
+        with self._lock:
+            if vault_id in self._keys:
+                self._wipe(self._keys[vault_id][0])
+            self._keys[vault_id] = [bytearray(key.encode('ascii')), timeout or self.idle_timeout, time.monotonic()]
+
+    def get(self, vault_id):
+        with self._lock:
+            entry = self._keys.get(vault_id)
+            if entry is None:
+                return None
+            entry[2] = time.monotonic()
+            return entry[0].decode('ascii')
+
+    def lock(self, vault_id=None):
+        with self._lock:
+            targets = [vault_id] if vault_id is not None else list(self._keys)
+            for target in targets:
+                entry = self._keys.pop(target, None)
+                if entry is not None:
+                    self._wipe(entry[0])
+            return len(targets)
+
+    def expire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [vid for vid, (_, timeout, last) in self._keys.items() if now - last > timeout]
+        for vault_id in expired:
+            self.lock(vault_id)
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            return {vid: round(timeout - (now - last)) for vid, (_, timeout, last) in self._keys.items()}
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    """Atiende una petición JSON por línea"""
+    def handle(self):
+        if not self.server.peer_allowed(self.request):
+            return
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line.decode('utf-8'))
+            response = self.server.dispatch(request)
+        except Exception as e:
+            response = {'ok': False, 'error': str(e)}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Servidor del agente sobre un socket Unix con permisos 0600"""
+    daemon_threads = True
+
+    def __init__(self, socket_path, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.socket_path = socket_path
+        self.store = _KeyStore(idle_timeout)
+        prepare_socket_directory(socket_path)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _AgentHandler)
+        finally:
+            os.umask(old_umask)
+
+    def peer_allowed(self, conn):
+        """Solo acepta conexiones del mismo usuario (SO_PEERCRED en Linux)"""
+        uid = peer_uid(conn)
+        return uid is None or uid == os.getuid()  # Sin SO_PEERCRED, el directorio 0700 ya restringe el acceso
+
+    def dispatch(self, request):
+        op = request.get('op')
+        if op == 'get':
+            key = self.store.get(request['vault'])
+            return {'ok': key is not None, 'key': key}
+        if op == 'add':
+            self.store.add(request['vault'], request['key'], request.get('timeout'))
+            return {'ok': True}
+        if op == 'lock':
+            return {'ok': True, 'locked': self.store.lock(request.get('vault'))}
+        if op == 'status':
+            return {'ok': True, 'vaults': self.store.status()}
+        if op == 'stop':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'ok': True}
+        return {'ok': False, 'error': f"Operación desconocida: {op}"}
+
+    def serve(self):
+        """Bucle principal con purga periódica de claves caducadas"""
+        def reaper():
+            while True:
+                time.sleep(1)
+                self.store.expire()
+        threading.Thread(target=reaper, daemon=True).start()
+        try:
+            self.serve_forever()
+        finally:
+            self.store.lock()
+            self.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+def request_agent(request, socket_path=None):
+    """
+    Envía una petición al agente; devuelve None si no está disponible o si el
+    socket no es de confianza (directorio o socket ajenos, o servidor de otro usuario).
+    """
+    socket_path = socket_path or default_socket_path()
+    if not socket_trusted(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CLIENT_TIMEOUT)
+            sock.connect(socket_path)
+            if peer_uid(sock) not in (None, os.getuid()):
+                return None
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as reader:
+                return json.loads(reader.readline().decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def get_key(vault_id, socket_path=None):
+    """Pide al agente la clave de un almacén"""
+    response = request_agent({'op': 'get', 'vault': vault_id}, socket_path)
+    if response and response.get('ok'):
+        return response['key'].encode('ascii')
+    return None
+
+
+def add_key(vault_id, key, timeout=None, socket_path=None):
+    """Entrega al agente la clave derivada de un almacén"""
+    request = {'op': 'add', 'vault': vault_id, 'key': key.decode('ascii'), 'timeout': timeout}
+    response = request_agent(request, socket_path)
+    return bool(response and response.get('ok'))
+
+
+def lock(vault_id=None, socket_path=None):
+    """Hace que el agente olvide una clave (o todas)"""
+    response = request_agent({'op': 'lock', 'vault': vault_id}, socket_path)
+    return bool(response and response.get('ok'))
+
+
+def main():
+    """Función principal del agente"""
+    args = sys.argv[1:]
+    command = args[0] if args else 'help'
+    socket_path = default_socket_path()
+
+    if command == 'start':
+        timeout = DEFAULT_IDLE_TIMEOUT
+        if '--timeout' in args:
+            timeout = int(args[args.index('--timeout') + 1])
+        if request_agent({'op': 'status'}, socket_path) is not None:
+            print(f"⚠️  Ya hay un agente escuchando en {socket_path}")
+            return
+        try:
+            server = AgentServer(socket_path, timeout)
+        except PermissionError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"🔑 Agente de Cerbero escuchando en {socket_path} (inactividad: {timeout}s)")
+        print(f"   export CERBERO_AGENT_SOCK={socket_path}")
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            pass
+        print("👋 Agente detenido.")
+    elif command in ('lock', 'stop', 'status'):
+        response = request_agent({'op': command}, socket_path)
+        if response is None:
+            print("❌ No hay ningún agente en ejecución.")
+        elif command == 'status':
+            vaults = response['vaults']
+            print(f"🔑 Agente activo con {len(vaults)} almacén(es) desbloqueado(s).")
+            for vault_id, remaining in vaults.items():
+                print(f"   {vault_id} (caduca en {remaining}s)")
+        elif command == 'lock':
+            print("🔒 Claves olvidadas por el agente.")
+        else:
+            print("👋 Agente detenido.")
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
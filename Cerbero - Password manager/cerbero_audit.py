@@ -0,0 +1,163 @@
+"""
+Auditoría de contraseñas de Cerbero
+Descripción: Puntuación de fortaleza y consulta de listas de contraseñas
+filtradas. Solo usa la biblioteca estándar para que los procesos de trabajo
+arranquen rápido y no carguen cryptography ni el almacén: reciben contraseñas
+por una tubería y devuelven únicamente puntuaciones. Nada se escribe en disco.
+
+La lista de filtraciones es un archivo de texto ordenado con un hash SHA-1 en
+hexadecimal por línea, opcionalmente seguido de ':apariciones' (el formato de
+descarga de Have I Been Pwned). Se consulta con búsqueda binaria sobre mmap,
+sin cargarlo en memoria.
+"""
+
+import os
+import re
+import math
+import mmap
+import string
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+POOL_MIN_PASSWORDS = 20000  # Por debajo, puntuar en el propio proceso sale más barato
+CHUNK_SIZE = 5000
+
+# Puntuación 0-4 según los bits estimados (umbrales al estilo de zxcvbn)
+SCORE_THRESHOLDS = (28, 36, 60, 80)
+
+COMMON_PASSWORDS = frozenset("""
+123456 123456789 12345678 12345 1234567 1234567890 111111 000000 123123 654321
+password password1 passw0rd qwerty qwerty123 qwertyuiop abc123 iloveyou admin
+welcome letmein monkey dragon football baseball master sunshine princess shadow
+trustno1 superman starwars whatever secret login changeme default contraseña
+contrasena hola123 teamo tequiero bienvenido futbol barcelona realmadrid
+""".split())
+
+KEYBOARD_ROWS = ('qwertyuiop', 'asdfghjkl', 'zxcvbnm', '1234567890')
+_KEYBOARD_RUNS = frozenset(row[i:i + 4] for row in KEYBOARD_ROWS for i in range(len(row) - 3))
+_YEAR = re.compile(r'(?:19|20)\d\d')
+# Clases de caracteres y tamaño del alfabeto que aporta cada una
+_CHAR_CLASSES = (
+    (frozenset(string.ascii_lowercase), 26),
+    (frozenset(string.ascii_uppercase), 26),
+    (frozenset(string.digits), 10),
+    (frozenset(string.punctuation + ' '), 33),
+)
+
+
+def password_strength(password):
+    """
+    Estima la fortaleza de una contraseña.
+    Devuelve (puntuación 0-4, bits estimados, motivos).
+    """
+    lowered = password.lower()
+    if lowered in COMMON_PASSWORDS:
+        return 0, 0.0, ['contraseña común']
+    reasons = []
+    chars = set(password)
+    pool = sum(size for members, size in _CHAR_CLASSES if not chars.isdisjoint(members))
+    if not password.isascii():
+        pool += 100
+    # Repeticiones y secuencias ('aaaa', 'abcd', '4321') apenas aportan
+    codes = [ord(char) for char in password]
+    predictable = sum(1 for a, b in zip(codes, codes[1:]) if -1 <= b - a <= 1)
+    effective = len(password) - 0.75 * predictable
+    if effective < len(password) * 0.75:
+        reasons.append('repeticiones o secuencias')
+    if any(lowered[i:i + 4] in _KEYBOARD_RUNS for i in range(len(lowered) - 3)):
+        effective -= 2
+        reasons.append('patrón de teclado')
+    if _YEAR.search(lowered):
+        effective -= 2
+        reasons.append('contiene un año')
+    if len(password) < 8:
+        reasons.append('corta')
+    if pool <= 10:
+        reasons.append('solo dígitos' if pool == 10 else 'sin variedad de caracteres')
+    bits = max(0.0, effective) * math.log2(max(pool, 2))
+    score = sum(bits >= threshold for threshold in SCORE_THRESHOLDS)
+    return score, round(bits, 1), reasons
+
+
+def score_passwords(passwords):
+    """Puntúa un bloque de contraseñas (función de trabajo del pool)"""
+    return [password_strength(password) for password in passwords]
+
+
+def score_all(passwords, workers=None):
+    """Puntúa todas las contraseñas, repartiendo bloques en un pool de procesos si son muchas"""
+    chunks = [passwords[i:i + CHUNK_SIZE] for i in range(0, len(passwords), CHUNK_SIZE)]
+    workers = workers or min(len(chunks), os.cpu_count() or 1)
+    if workers <= 1 or len(passwords) < POOL_MIN_PASSWORDS:
+        return score_passwords(passwords)
+    # spawn: los procesos no heredan una copia del almacén ni de las claves
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        return [result for chunk in pool.map(score_passwords, chunks) for result in chunk]
+
+
+class BreachList:
+    """Lista ordenada de hashes SHA-1 filtrados, consultada por búsqueda binaria sobre mmap"""
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    def _search(self, key, lo, hi):
+        """Búsqueda binaria entre las líneas de [lo, hi); devuelve (apariciones, inicio del tramo)"""
+        data = self._map
+        while lo < hi:
+            # Ir al principio de la línea que contiene el punto medio
+            start = data.rfind(b'\n', lo, (lo + hi) // 2) + 1 or lo
+            end = data.find(b'\n', start, hi)
+            if end < 0:
+                end = hi
+            line_key = data[start:start + len(key)]
+            if line_key == key:
+                _, _, occurrences = data[start:end].partition(b':')
+                return (int(occurrences) if occurrences.strip().isdigit() else 1), start
+            if line_key < key:
+                lo = end + 1
+            else:
+                hi = start
+        return 0, lo
+
+    def count(self, sha1_hex):
+        """Apariciones de un hash (hexadecimal en mayúsculas) o 0 si no está en la lista"""
+        key = sha1_hex.encode('ascii') if isinstance(sha1_hex, str) else sha1_hex
+        return self._search(key.upper(), 0, len(self._map))[0]
+
+    def count_many(self, keys):
+        """
+        Apariciones de varios hashes (bytes hexadecimales en mayúsculas). Se buscan
+        en orden y cada búsqueda galopa desde donde acabó la anterior, así que con
+        muchas consultas cada una recorre un tramo pequeño del archivo.
+        """
+        data, size = self._map, len(self._map)
+        results = [0] * len(keys)
+        lo = 0
+        for i in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[i]
+            step, hi = 4096, size
+            while lo + step < size:
+                probe = data.find(b'\n', lo + step) + 1
+                if not 0 < probe < size:
+                    break
+                if data[probe:probe + len(key)] >= key:
+                    hi = data.find(b'\n', probe) + 1 or size
+                    break
+                lo, step = probe, step * 2
+            results[i], lo = self._search(key, lo, hi)
+        return results
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
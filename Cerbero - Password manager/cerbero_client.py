@@ -0,0 +1,125 @@
+"""
+Cliente del servicio de credenciales de Cerbero
+Descripción: Biblioteca ligera (solo biblioteca estándar, sin cryptography) para
+pedir credenciales a cerbero_service.py por su socket Unix. Mantiene una conexión
+abierta y la reutiliza entre peticiones. Antes de enviar nada comprueba, como la
+CLI con el agente, que el socket y su directorio son del usuario y que el
+servicio corre con su mismo uid.
+
+Uso:
+    from cerbero_client import CerberoClient
+    with CerberoClient() as client:
+        password = client.get_password('aws', 'prod')
+"""
+
+import os
+import json
+import socket
+import tempfile
+
+import cerbero_agent
+
+CLIENT_TIMEOUT = 2.0
+
+
+def default_socket_path():
+    """Ruta del socket del servicio (misma regla que cerbero_service.py)"""
+    path = os.environ.get('CERBERO_SERVICE_SOCK')
+    if path:
+        return path
+    base = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(base, f"cerbero-{os.getuid()}", 'service.sock')
+
+
+class CerberoError(Exception):
+    """Respuesta de error del servicio (p. ej. not_found, ambiguous o rate_limited)"""
+    def __init__(self, response):
+        super().__init__(response.get('error'))
+        self.response = response
+        self.retry_after = response.get('retry_after')
+
+
+class CerberoClient:
+    """Conexión persistente al servicio; no es segura entre hilos (usa una por hilo)"""
+    def __init__(self, socket_path=None, timeout=CLIENT_TIMEOUT):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+
+    def connect(self):
+        """Conecta si hace falta; lanza PermissionError si el socket no es de confianza"""
+        if self._sock is None:
+            if not cerbero_agent.socket_trusted(self.socket_path):
+                raise PermissionError(f"Socket no fiable: {self.socket_path}")
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+                if cerbero_agent.peer_uid(sock) not in (None, os.getuid()):
+                    raise PermissionError("El servicio pertenece a otro usuario")
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+            self._reader = sock.makefile('rb')
+        return self
+
+    def close(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = self._reader = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def call(self, request):
+        """Envía una petición y devuelve la respuesta; lanza CerberoError si no es ok"""
+        self.connect()
+        try:
+            self._sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            line = self._reader.readline()
+        except OSError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError("El servicio cerró la conexión")
+        response = json.loads(line.decode('utf-8'))
+        if not response.get('ok'):
+            raise CerberoError(response)
+        return response
+
+    def get(self, site, identifier=None):
+        """Credencial de un sitio: dict con site, username, account_name y password"""
+        return self.call({'cmd': 'get', 'site': site, 'identifier': identifier})
+
+    def get_password(self, site, identifier=None):
+        return self.get(site, identifier)['password']
+
+    def list(self, prefix=None, limit=None, offset=0, sort=None):
+        """Filas (site, username, account_name); si hay más, la respuesta trae next_offset"""
+        return self.call({'cmd': 'list', 'prefix': prefix, 'limit': limit, 'offset': offset, 'sort': sort})
+
+    def add(self, site, username, password, account_name=None, overwrite=False):
+        """Añade o actualiza una credencial; responde cuando el cambio ya es duradero"""
+        return self.call({'cmd': 'add', 'site': site, 'username': username, 'password': password,
+                          'account_name': account_name, 'overwrite': overwrite})
+
+
+def request(request, socket_path=None):
+    """Petición suelta; devuelve la respuesta (aunque sea de error) o None si no hay servicio fiable"""
+    socket_path = socket_path or default_socket_path()
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        with CerberoClient(socket_path) as client:
+            return client.call(request)
+    except CerberoError as e:
+        return e.response
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,276 @@
+"""
+Servicio de credenciales de Cerbero
+Descripción: Demonio asyncio que mantiene desbloqueado un único PasswordManager
+y atiende peticiones get/list/add por un socket Unix accesible solo por el
+usuario, para que otros servicios no tengan que lanzar la CLI (arranque del
+intérprete, PBKDF2 y load_vault) en cada consulta. Aplica un límite de
+peticiones por cliente y deja un registro de auditoría sin contraseñas.
+
+Protocolo: una petición JSON por línea y una respuesta JSON por línea, sobre
+una conexión que puede reutilizarse. Si la petición lleva 'id', la respuesta
+lo devuelve.
+    {"cmd": "get", "site": "aws", "identifier": "prod"}
+    {"cmd": "list", "prefix": "a", "limit": 100, "offset": 0}
+    {"cmd": "add", "site": "aws", "username": "u", "password": "p", "overwrite": false}
+    {"cmd": "status"}
+
+Uso:
+    python cerbero_service.py start [--rate N] [--burst N] [--audit RUTA]
+    python cerbero_service.py status
+    python cerbero_service.py stop
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import struct
+import asyncio
+import threading
+import cerbero_agent
+import cerbero_client
+
+DEFAULT_RATE = 200.0  # Peticiones por segundo y cliente
+DEFAULT_BURST = 400
+DEFAULT_LIST_LIMIT = 1000  # Filas por respuesta de 'list' si no se pide otra cosa
+MAX_REQUEST_BYTES = 64 * 1024
+AUDIT_FLUSH_INTERVAL = 1.0
+SERVICE_COMMANDS = ('get', 'list', 'add')
+
+
+def default_audit_path():
+    """Registro de auditoría junto al socket"""
+    return os.path.join(os.path.dirname(cerbero_client.default_socket_path()), 'service-audit.jsonl')
+
+
+class _RateLimiter:
+    """Cubo de fichas por cliente: `rate` peticiones/s con ráfagas de hasta `burst`"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # cliente -> [fichas, última recarga]
+
+    def admit(self, client):
+        """Consume una ficha; devuelve 0 si se admite o los segundos hasta la siguiente"""
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = [self.burst, now]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / self.rate
+
+    def prune(self):
+        """Olvida los clientes con el cubo lleno (sin actividad reciente)"""
+        now = time.monotonic()
+        full = [client for client, (tokens, last) in self._buckets.items()
+                if tokens + (now - last) * self.rate >= self.burst]
+        for client in full:
+            del self._buckets[client]
+
+
+class CredentialService:
+    """Servidor asyncio sobre un socket Unix con permisos 0600"""
+    def __init__(self, manager, socket_path=None, rate=DEFAULT_RATE, burst=DEFAULT_BURST, audit_path=None):
+        self.manager = manager
+        self.socket_path = socket_path or cerbero_client.default_socket_path()
+        self.audit_path = audit_path
+        self.limiter = _RateLimiter(rate, burst)
+        self.stats = {'requests': 0, 'rate_limited': 0, 'errors': 0, 'clients': 0}
+        self._audit = None
+        self._server = None
+        self._stopped = None
+        self._connections = {}  # tarea -> writer de cada conexión abierta
+        # PasswordManager no es seguro entre hilos: las peticiones se ejecutan de
+        # una en una en el pool del bucle, nunca en el propio bucle
+        self._manager_lock = threading.Lock()
+
+    @staticmethod
+    def peer(sock):
+        """(uid, pid) del proceso conectado (SO_PEERCRED en Linux) o None si no se conoce"""
+        if not hasattr(socket, 'SO_PEERCRED'):
+            return None
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        pid, uid, _ = struct.unpack('3i', creds)
+        return uid, pid
+
+    def audit(self, client, cmd, request, response):
+        """Anota una petición en el registro de auditoría (nunca la contraseña)"""
+        if self._audit is None:
+            return
+        entry = {'ts': round(time.time(), 3), 'client': client, 'cmd': cmd, 'ok': response.get('ok')}
+        for field in ('site', 'identifier', 'username', 'account_name', 'prefix'):
+            if request.get(field) is not None:
+                entry[field] = request[field]
+        if not response.get('ok'):
+            entry['error'] = response.get('error')
+        self._audit.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def execute(self, cmd, request):
+        """Ejecuta una petición en el manager (desde un hilo del pool, de una en una)"""
+        with self._manager_lock:
+            return self.manager.execute_request(cmd, request)
+
+    async def dispatch(self, request, client):
+        """Ejecuta una petición ya decodificada y devuelve la respuesta"""
+        cmd = str(request.get('cmd', '')).lower()
+        if cmd == 'status':
+            return dict(self.stats, ok=True, sites=len(self.manager.vault_data))
+        if cmd == 'stop':
+            self._stopped.set()
+            return {'ok': True}
+        if cmd not in SERVICE_COMMANDS:
+            return {'cmd': cmd, 'ok': False, 'error': f"Comando no permitido: {cmd}"}
+        retry_after = self.limiter.admit(client)
+        if retry_after:
+            self.stats['rate_limited'] += 1
+            response = {'cmd': cmd, 'ok': False, 'error': 'rate_limited', 'retry_after': round(retry_after, 3)}
+        else:
+            if cmd == 'list' and request.get('limit') is None:
+                request['limit'] = DEFAULT_LIST_LIMIT
+            # refresh() puede esperar al bloqueo del almacén o descifrar y recargar:
+            # fuera del bucle, para no parar las demás conexiones
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, self.execute, cmd, request)
+            if cmd == 'add' and response['ok']:
+                # Responder solo cuando el cambio es duradero, sin bloquear el bucle
+                await loop.run_in_executor(None, self.manager.wait_durable)
+        self.audit(client, cmd, request, response)
+        return response
+
+    async def handle(self, reader, writer):
+        """Atiende una conexión: una respuesta por cada línea recibida"""
+        peer = self.peer(writer.get_extra_info('socket'))
+        if peer is not None and peer[0] != os.getuid():
+            writer.close()
+            return
+        client = peer[1] if peer is not None else id(writer)
+        self.stats['clients'] += 1
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # Línea más larga que MAX_REQUEST_BYTES
+                    writer.write(b'{"ok": false, "error": "request_too_large"}\n')
+                    break
+                if not line:
+                    break
+                self.stats['requests'] += 1
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("La petición debe ser un objeto JSON")
+                    response = await self.dispatch(request, client)
+                    if 'id' in request:
+                        response['id'] = request['id']
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    response = {'ok': False, 'error': str(e)}
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.stats['clients'] -= 1
+            del self._connections[asyncio.current_task()]
+            writer.close()
+
+    async def _housekeeping(self):
+        """Vuelca el registro de auditoría y purga los límites de clientes inactivos"""
+        while True:
+            await asyncio.sleep(AUDIT_FLUSH_INTERVAL)
+            if self._audit is not None:
+                self._audit.flush()
+            self.limiter.prune()
+
+    async def serve(self):
+        """Escucha hasta recibir 'stop', SIGINT o SIGTERM"""
+        cerbero_agent.prepare_socket_directory(self.socket_path)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        if self.audit_path:
+            fd = os.open(self.audit_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            self._audit = os.fdopen(fd, 'a', encoding='utf-8', buffering=1 << 16)
+        self._stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self._stopped.set)
+        old_umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(
+                self.handle, self.socket_path, limit=MAX_REQUEST_BYTES, backlog=1024)
+        finally:
+            os.umask(old_umask)
+        housekeeping = asyncio.create_task(self._housekeeping())
+        try:
+            await self._stopped.wait()
+        finally:
+            housekeeping.cancel()
+            self._server.close()
+            # Cerrar las conexiones abiertas: cada manejador ve EOF y termina solo
+            handlers = list(self._connections.items())
+            for _, writer in handlers:
+                writer.close()
+            await asyncio.gather(*(task for task, _ in handlers), return_exceptions=True)
+            await self._server.wait_closed()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            if self._audit is not None:
+                self._audit.close()
+            with self._manager_lock:
+                self.manager.close()
+
+
+def main():
+    """Función principal del servicio"""
+    args = sys.argv[1:]
+    command = args[0] if args else 'help'
+    socket_path = cerbero_client.default_socket_path()
+
+    def option(name, default, kind):
+        return kind(args[args.index(name) + 1]) if name in args else default
+
+    if command == 'start':
+        if cerbero_client.request({'cmd': 'status'}, socket_path) is not None:
+            print(f"⚠️  Ya hay un servicio escuchando en {socket_path}")
+            return
+        # Comprobar el directorio antes de pedir la contraseña maestra
+        try:
+            cerbero_agent.prepare_socket_directory(socket_path)
+        except PermissionError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        from password_manager import PasswordManager
+        manager = PasswordManager()
+        if not manager.unlock_vault():
+            sys.exit(1)
+        service = CredentialService(manager, socket_path, option('--rate', DEFAULT_RATE, float),
+                                    option('--burst', DEFAULT_BURST, int),
+                                    option('--audit', default_audit_path(), str))
+        print(f"🛰️  Servicio de Cerbero escuchando en {socket_path}")
+        print(f"   export CERBERO_SERVICE_SOCK={socket_path}")
+        print(f"   Auditoría: {service.audit_path}")
+        asyncio.run(service.serve())
+        print("👋 Servicio detenido.")
+    elif command in ('status', 'stop'):
+        response = cerbero_client.request({'cmd': command}, socket_path)
+        if response is None:
+            print("❌ No hay ningún servicio en ejecución.")
+        elif command == 'status':
+            print(f"🛰️  Servicio activo: {response['sites']} sitio(s), {response['clients']} cliente(s) "
+                  f"conectado(s), {response['requests']} petición(es), "
+                  f"{response['rate_limited']} limitada(s).")
+        else:
+            print("👋 Servicio detenido.")
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
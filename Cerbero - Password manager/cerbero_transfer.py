@@ -0,0 +1,222 @@
+"""
+Importación y exportación de credenciales de Cerbero
+Descripción: Lectores y escritores en streaming (generadores, memoria constante)
+para CSV, JSONL y las exportaciones CSV de los navegadores y gestores más
+comunes. Solo usa la biblioteca estándar: el cifrado lo aporta quien llama
+mediante funciones encrypt/decrypt, así que este módulo nunca ve claves.
+
+Formatos de importación (se detectan por el contenido):
+    - CSV con cabecera. Las columnas se reconocen por nombre: Cerbero
+      (site,username,password,account_name), Chrome/Edge/Brave
+      (name,url,username,password,note), Firefox (url,username,password,...),
+      Safari y KeePassXC (Title,URL,Username,Password,...) y Bitwarden
+      (name,login_uri,login_username,login_password,...). Las notas se ignoran:
+      son texto libre (a menudo códigos de recuperación) y no deben acabar en la
+      identidad de la credencial. La exportación 'chrome' de Cerbero añade una
+      columna account_name para conservar la cuenta.
+    - JSONL: un objeto por línea con site, username, password y account_name.
+    - Exportación cifrada de Cerbero (ver abajo).
+
+Exportación cifrada: una cabecera JSON en claro con los parámetros del KDF y
+después un token por bloque de filas. Cada bloque lleva su número de secuencia
+y el último va marcado, así que se detectan bloques perdidos, reordenados o un
+archivo truncado.
+
+Uso:
+    import cerbero_transfer
+    for line_number, row in cerbero_transfer.read_rows(stream):
+        ...
+"""
+
+import csv
+import json
+import collections
+import urllib.parse
+
+EXPORT_FORMAT = "cerbero-export"
+EXPORT_FORMAT_VERSION = 1
+EXPORT_CHUNK_ROWS = 1000  # Filas por bloque cifrado
+EXPORT_FORMATS = ('csv', 'jsonl', 'chrome')
+
+# Fila normalizada; account_name es None si no hay
+Row = collections.namedtuple('Row', 'site username password account_name')
+
+# Nombres de columna reconocidos (en minúsculas) para cada campo, por prioridad
+COLUMN_ALIASES = {
+    'site': ('site', 'website', 'name', 'title'),
+    'url': ('url', 'login_uri', 'uri', 'origin_url'),
+    'username': ('username', 'login_username', 'user', 'login', 'user name'),
+    'password': ('password', 'login_password'),
+    'account_name': ('account_name', 'account'),
+}
+
+
+def site_from_url(url):
+    """Nombre del sitio a partir de una URL: el host sin 'www.'"""
+    url = url.strip()
+    if '://' not in url:
+        url = '//' + url
+    host = urllib.parse.urlsplit(url).hostname or ''
+    return host[4:] if host.startswith('www.') else host
+
+
+def make_row(site=None, username=None, password=None, account_name=None, url=None):
+    """
+    Normaliza una fila; devuelve un Row o un texto con el motivo si no es válida.
+    Lanza ValueError si algún campo no es texto (p. ej. un número en un JSONL).
+    """
+    for field, value in (('site', site), ('username', username), ('password', password),
+                         ('account_name', account_name), ('url', url)):
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"el campo {field} debe ser texto")
+    site = (site or '').strip() or site_from_url(url or '')
+    if not site:
+        return "falta el sitio"
+    if not password:
+        return "falta la contraseña"
+    return Row(site, (username or '').strip(), password, (account_name or '').strip() or None)
+
+
+def read_csv(stream):
+    """Genera (número de línea, Row o motivo del error) de un CSV con cabecera"""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    names = [name.strip().lower() for name in header]
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in names:
+                columns[field] = names.index(alias)
+                break
+    if 'password' not in columns or not columns.keys() & {'site', 'url'}:
+        raise ValueError(f"Cabecera CSV no reconocida: {','.join(header)}")
+    width = max(columns.values()) + 1
+    for values in reader:
+        if not values:
+            continue
+        if len(values) < width:
+            yield reader.line_num, "faltan columnas"
+            continue
+        fields = {field: values[index] for field, index in columns.items()}
+        yield reader.line_num, make_row(**fields)
+
+
+def read_jsonl(stream):
+    """Genera (número de línea, Row o motivo del error) de un JSONL"""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, "JSON no válido"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, "se esperaba un objeto JSON"
+            continue
+        try:
+            row = make_row(record.get('site'), record.get('username'), record.get('password'),
+                           record.get('account_name'), record.get('url'))
+        except ValueError as e:
+            row = str(e)
+        yield line_number, row
+
+
+def read_header(stream):
+    """Cabecera de una exportación cifrada o None si el archivo no lo es (deja el flujo al inicio)"""
+    first_line = stream.readline()
+    try:
+        header = json.loads(first_line) if first_line.startswith('{') else None
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get('format') != EXPORT_FORMAT:
+        stream.seek(0)
+        return None
+    if header.get('version') != EXPORT_FORMAT_VERSION:
+        raise ValueError("Versión de exportación no soportada")
+    return header
+
+
+def read_encrypted(stream, decrypt):
+    """
+    Genera (número de fila, Row o motivo) de una exportación cifrada cuya
+    cabecera ya se leyó. Descifra un bloque cada vez.
+    """
+    expected, row_number = 0, 0
+    for token in stream:
+        token = token.strip()
+        if not token:
+            continue
+        chunk = json.loads(decrypt(token.encode('ascii')))
+        if chunk['seq'] != expected:
+            raise ValueError("Exportación dañada: bloques perdidos o desordenados")
+        expected += 1
+        for fields in chunk['rows']:
+            row_number += 1
+            yield row_number, make_row(*fields)
+        if chunk['last']:
+            return
+    raise ValueError("Exportación truncada: falta el último bloque")
+
+
+def read_rows(stream, decrypt_for=None):
+    """
+    Detecta el formato y genera (número de línea, Row o motivo del error).
+    :param stream: texto abierto con newline='' (lo exige el módulo csv).
+    :param decrypt_for: función cabecera -> decrypt(bytes) para exportaciones cifradas.
+    """
+    header = read_header(stream)
+    if header is not None:
+        if decrypt_for is None:
+            raise ValueError("Exportación cifrada: hace falta su contraseña")
+        return read_encrypted(stream, decrypt_for(header))
+    first = stream.read(1)
+    stream.seek(0)
+    return read_jsonl(stream) if first == '{' else read_csv(stream)
+
+
+def write_rows(rows, stream, fmt='csv'):
+    """Escribe filas en CSV, JSONL o CSV de Chrome; devuelve cuántas escribió"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    count = 0
+    if fmt == 'jsonl':
+        for count, row in enumerate(rows, 1):
+            stream.write(json.dumps(row._asdict(), ensure_ascii=False) + '\n')
+        return count
+    writer = csv.writer(stream, lineterminator='\n')
+    if fmt == 'chrome':
+        # La cuenta va en la nota (visible en Chrome) y en account_name, la
+        # columna que lee Cerbero; Chrome ignora las columnas que no conoce
+        writer.writerow(('name', 'url', 'username', 'password', 'note', 'account_name'))
+        for count, row in enumerate(rows, 1):
+            url = f"https://{row.site}/" if '.' in row.site and ' ' not in row.site else ''
+            account = row.account_name or ''
+            writer.writerow((row.site, url, row.username, row.password, account, account))
+    else:
+        writer.writerow(Row._fields)
+        for count, row in enumerate(rows, 1):
+            writer.writerow((row.site, row.username, row.password, row.account_name or ''))
+    return count
+
+
+def write_encrypted(rows, stream, header, encrypt, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Escribe la cabecera y un token por bloque de filas; devuelve cuántas filas escribió"""
+    stream.write(json.dumps(dict(header, format=EXPORT_FORMAT, version=EXPORT_FORMAT_VERSION)) + '\n')
+    count, seq, chunk = 0, 0, []
+
+    def emit(last):
+        payload = json.dumps({'seq': seq, 'rows': chunk, 'last': last}, ensure_ascii=False)
+        stream.write(encrypt(payload.encode('utf-8')).decode('ascii') + '\n')
+
+    for row in rows:
+        chunk.append(list(row))
+        count += 1
+        if len(chunk) == chunk_rows:
+            emit(False)
+            seq, chunk = seq + 1, []
+    emit(True)
+    return count
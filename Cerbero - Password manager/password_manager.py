@@ -7,21 +7,264 @@ Descripción: Gestor de contraseñas CLI con cifrado fuerte y almacenamiento loc
 import os
 import sys
 import json
+import time
+import types
+import atexit
 import getpass
-import pyperclip
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.fernet import Fernet
 import base64
+import collections
+import contextlib
+import functools
+import hashlib
+import heapq
+import itertools
+import hmac
 import secrets
+import shlex
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+__version__ = "1.0.0"
+
+# Formato segmentado del almacén: una cabecera JSON en claro seguida de
+# registros Fernet (uno por línea). Los registros son segmentos por sitio
+# o entradas del registro de cambios (journal) que se añaden al final.
+VAULT_FORMAT = "cerbero-segmented"
+VAULT_FORMAT_VERSION = 2
+
+# Algoritmos de derivación de clave soportados y sus parámetros por defecto
+KDF_DEFAULTS = {
+    'pbkdf2-sha256': {'iterations': 480000},
+    'scrypt': {'n': 2 ** 17, 'r': 8, 'p': 1},
+    'argon2id': {'iterations': 3, 'memory_cost': 65536, 'lanes': 4},  # memory_cost en KiB
+}
+DEFAULT_UNLOCK_TARGET_MS = 500
+
+
+# Las dependencias pesadas se importan bajo demanda para que 'help' y
+# '--version' no paguen cryptography (decenas de ms), el portapapeles ni los
+# módulos del agente y la auditoría (sockets, multiprocessing)
+@functools.lru_cache(maxsize=None)
+def _crypto():
+    """Importa las primitivas de cryptography bajo demanda"""
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+    try:
+        from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+    except ImportError:  # cryptography < 44
+        Argon2id = None
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.fernet import Fernet
+    return types.SimpleNamespace(hashes=hashes, PBKDF2HMAC=PBKDF2HMAC, Scrypt=Scrypt, Argon2id=Argon2id,
+                                 HKDF=HKDF, Cipher=Cipher, algorithms=algorithms, modes=modes, Fernet=Fernet)
+
+
+def _agent():
+    """Importa el cliente del agente de claves bajo demanda"""
+    import cerbero_agent
+    return cerbero_agent
+
+
+def _audit():
+    """Importa el módulo de auditoría bajo demanda"""
+    import cerbero_audit
+    return cerbero_audit
+
+
+def _transfer():
+    """Importa el módulo de importación/exportación bajo demanda"""
+    import cerbero_transfer
+    return cerbero_transfer
+
+
+class Credential:
+    """
+    Credencial compacta en memoria. La contraseña nunca se guarda en claro:
+    `secret` contiene nonce + texto cifrado (AES-CTR con una clave derivada
+    de la del almacén) y solo se descifra bajo demanda en un búfer borrable.
+    """
+    __slots__ = ('username', 'account_name', 'secret')
+
+    def __init__(self, username, secret, account_name=None):
+        self.username = username
+        self.account_name = account_name or None
+        self.secret = secret
+
+    def to_record(self):
+        """Representación serializable (la contraseña sigue cifrada)"""
+        record = {'username': self.username, 'secret': base64.b64encode(self.secret).decode('ascii')}
+        if self.account_name:
+            record['account_name'] = self.account_name
+        return record
+
+
+def _lazy_sorted(items):
+    """Itera en orden usando un montículo: las primeras k filas cuestan O(n + k log n)"""
+    heap = list(items)
+    heapq.heapify(heap)
+    while heap:
+        yield heapq.heappop(heap)
+
+
+def _trigrams(text):
+    """Trigramas de un texto normalizado, con relleno para favorecer prefijos"""
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Comando precompilado: método a invocar, parámetros posicionales
+# (nombre, tipo, obligatorio, recoge el resto), opciones '--x' -> (argumento,
+# tipo u opciones válidas), texto de uso, descripción y si necesita el almacén
+Command = collections.namedtuple('Command', 'method params options usage help needs_vault')
+
+
+def _command(method, signature='', help='', options=None, needs_vault=True):
+    """
+    Precompila la firma de un comando: '<obligatorio> [opcional] [n:int]'
+    y '<texto...>' para un último argumento que recoge el resto de la línea.
+    """
+    params, usage = [], []
+    for token in signature.split():
+        required = token.startswith('<')
+        name = token[1:-1]
+        rest = name.endswith('...')
+        name, _, kind = name.rstrip('.').partition(':')
+        params.append((name, int if kind == 'int' else str, required, rest))
+        usage.append(f"<{name}...>" if rest else f"<{name}>" if required else f"[{name}]")
+    options = options or {}
+    for flag, (_, kind) in options.items():
+        if kind is bool:
+            usage.append(f"[{flag}]")
+        else:
+            usage.append(f"[{flag} {'|'.join(kind) if isinstance(kind, tuple) else 'N'}]")
+    return Command(method, tuple(params), options, ' '.join(usage), help, needs_vault)
+
+
+def _parse_command_args(command, tokens):
+    """Valida y convierte los argumentos según la firma; devuelve (posicionales, opciones)"""
+    positional, options = [], {}
+    tokens = iter(tokens)
+    for token in tokens:
+        if not (token.startswith('--') and command.options):
+            positional.append(token)
+            continue
+        if token not in command.options:
+            raise ValueError(f"Opción desconocida: {token}")
+        name, kind = command.options[token]
+        if kind is bool:
+            options[name] = True
+            continue
+        value = next(tokens, None)
+        if value is None:
+            raise ValueError(f"Falta el valor de {token}")
+        if isinstance(kind, tuple):
+            if value not in kind:
+                raise ValueError(f"Valor no válido para {token}: {value} (usa {'|'.join(kind)})")
+            options[name] = value
+        else:
+            try:
+                options[name] = kind(value)
+            except ValueError:
+                raise ValueError(f"Valor no válido para {token}: {value}") from None
+    params = command.params
+    if params and params[-1][3] and len(positional) > len(params):
+        positional[len(params) - 1:] = [' '.join(positional[len(params) - 1:])]
+    required = sum(param[2] for param in params)
+    if not required <= len(positional) <= len(params):
+        raise ValueError("Número de argumentos incorrecto")
+    values = []
+    for (name, kind, _, _), value in zip(params, positional):
+        try:
+            values.append(kind(value))
+        except ValueError:
+            raise ValueError(f"Valor no válido para {name}: {value}") from None
+    return values, options
+
+
+# Registro de comandos (modo interactivo y línea de comandos), en orden de ayuda
+COMMANDS = {
+    'setup': _command('setup_initial_configuration', '', "Configuración inicial", needs_vault=False),
+    'add': _command('add_credential', '<sitio> <usuario> <contraseña> [nombre_cuenta]', "Añadir credencial"),
+    'get': _command('get_credential', '<sitio> [usuario_o_cuenta]', "Obtener credencial"),
+    'list': _command('list_command', '[prefijo]', "Listar credenciales (paginado)", options={
+        '--sort': ('sort', ('site', 'user')),
+        '--limit': ('limit', int),
+        '--page': ('page', int),
+        '--offset': ('offset', int),
+        '--json': ('as_json', bool),
+    }),
+    'search': _command('search_credentials', '<texto...>', "Búsqueda difusa en sitios, usuarios y cuentas"),
+    'delete': _command('delete_credential', '<sitio> [usuario_o_cuenta]', "Eliminar credencial"),
+    'import': _command('import_file', '<archivo>', "Importar CSV, JSONL, CSV de navegador o exportación cifrada",
+                       options={'--overwrite': ('overwrite', bool)}),
+    'export': _command('export_file', '<archivo> [prefijo]', "Exportar credenciales (en claro o cifradas)", options={
+        '--format': ('fmt', ('csv', 'jsonl', 'chrome')),
+        '--encrypt': ('encrypt', bool),
+    }),
+    'audit': _command('audit_vault', '[lista_filtraciones]', "Auditar reutilización, fortaleza y filtraciones"),
+    'lock': _command('lock_agent', '', "Olvidar la clave en el agente", needs_vault=False),
+    'calibrate': _command('calibrate', '[kdf] [ms:int]',
+                          "Medir y elegir parámetros del KDF (pbkdf2-sha256, scrypt, argon2id)", needs_vault=False),
+    'rekey': _command('rekey', '[kdf] [ms:int]', "Recifrar el almacén con nueva contraseña y/o KDF"),
+    'help': _command('show_help', '', "Mostrar esta ayuda", needs_vault=False),
+    'exit': _command(None, '', "Salir del programa", needs_vault=False),
+}
 
 class PasswordManager:
     def __init__(self):
         self.vault_file = "vault.enc"
         self.salt_file = "salt.key"
         self.iterations = 480000  # Número alto de iteraciones para PBKDF2
+        # KDF para almacenes nuevos (lo fija calibrate); el del almacén abierto
+        # (con su sal) se guarda en la cabecera de vault.enc
+        self.kdf_settings = None  # None: PBKDF2-SHA256 con self.iterations
+        self.vault_kdf = None
         self.vault_data = {}
         self.cipher_key = None
+        self._field_key = None  # (clave del almacén, clave de campos derivada)
+        # Estado del almacenamiento segmentado
+        self.compaction_min_records = 512  # Registros de journal antes de compactar
+        self._vault_format = None  # 'segmented', 'legacy' o None (sin escribir)
+        self._pending_ops = []
+        self._journal_records = 0
+        self._batch_depth = 0
+        # Persistencia asíncrona: un hilo escribe las tareas encoladas
+        self.async_persistence = True
+        self.save_delay = 0.2  # Segundos para agrupar ráfagas de cambios
+        self.retry_delay = 1.0  # Segundos antes de reintentar una escritura fallida
+        self._write_queue = []
+        self._writer_cond = threading.Condition()
+        self._writer_thread = None
+        self._writer_stop = False
+        self._writer_error = None
+        self._flush_requested = False
+        self._enqueued_seq = 0
+        self._durable_seq = 0
+        self._snapshot_queued = False
+        self._atexit_registered = False
+        # Acceso concurrente entre procesos: bloqueo consultivo en vault.enc.lock
+        # y estado del archivo reflejado en memoria, para recargar solo si cambió
+        self._disk_lock = threading.Lock()
+        self._disk_state = None  # (inodo, tamaño, mtime_ns) o None si no se ha cargado
+        self._disk_offset = 0  # Bytes del archivo ya aplicados en memoria
+        self._disk_generation = None  # Generación de la cabecera (cambia al compactar)
+        # Índices en memoria: (sitio, usuario, cuenta) -> credencial y
+        # (sitio, usuario) / (sitio, cuenta) -> lista de credenciales
+        self._identity_index = {}
+        self._username_index = {}
+        self._account_index = {}
+        # Índice de trigramas para búsqueda difusa: trigrama -> sitios / identidades
+        self._site_trigrams = {}
+        self._credential_trigrams = {}
+        # Agente de claves (ver cerbero_agent.py)
+        self.use_agent = True
+        self.list_page_size = 50  # Filas por página en 'list' interactivo (0: sin pausa)
+        self.agent_timeout = None  # None: usar el tiempo de inactividad del agente
         
     def generate_salt(self):
         """Genera una sal criptográfica segura de 16 bytes"""
@@ -41,25 +284,113 @@ class PasswordManager:
             print("❌ Error: Archivo de sal no encontrado. Ejecuta la configuración inicial.")
             sys.exit(1)
     
-    def de
-rive_key(self, password, salt):
-        """Deriva una clave de cifrado usando PBKDF2HMAC"""
+    def default_kdf(self):
+        """Parámetros de KDF para almacenes nuevos (sin sal)"""
+        if self.kdf_settings is not None:
+            return dict(self.kdf_settings)
+        return {'name': 'pbkdf2-sha256', 'iterations': self.iterations}
+    
+    def derive_key(self, password, salt, kdf=None):
+        """Deriva una clave de cifrado con el KDF indicado (por defecto PBKDF2HMAC)"""
+        kdf = kdf or {'name': 'pbkdf2-sha256', 'iterations': self.iterations}
         password_bytes = password.encode('utf-8')
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=self.iterations,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(password_bytes))
+        crypto = _crypto()
+        if kdf['name'] == 'pbkdf2-sha256':
+            kdf_impl = crypto.PBKDF2HMAC(
+                algorithm=crypto.hashes.SHA256(),
+                length=32,
+                salt=salt,
+                iterations=kdf['iterations'],
+            )
+        elif kdf['name'] == 'scrypt':
+            kdf_impl = crypto.Scrypt(salt=salt, length=32, n=kdf['n'], r=kdf['r'], p=kdf['p'])
+        elif kdf['name'] == 'argon2id':
+            if crypto.Argon2id is None:
+                raise ValueError("Argon2id requiere cryptography >= 44")
+            kdf_impl = crypto.Argon2id(salt=salt, length=32, iterations=kdf['iterations'],
+                                lanes=kdf['lanes'], memory_cost=kdf['memory_cost'])
+        else:
+            raise ValueError(f"KDF no soportado: {kdf['name']}")
+        key = base64.urlsafe_b64encode(kdf_impl.derive(password_bytes))
         return key
     
+    def _time_kdf(self, kdf, repeats=3, warmup=False):
+        """
+        Mide en milisegundos una derivación con los parámetros dados (mediana de
+        `repeats` muestras). Con warmup se deriva antes una vez sin medir, para no
+        contar la importación de cryptography ni el arranque en frío.
+        """
+        if warmup:
+            self.derive_key('calibracion', secrets.token_bytes(16), kdf)
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            self.derive_key('calibracion', secrets.token_bytes(16), kdf)
+            samples.append((time.perf_counter() - start) * 1000)
+        return sorted(samples)[len(samples) // 2]
+    
+    def calibrate_kdf(self, name='pbkdf2-sha256', target_ms=DEFAULT_UNLOCK_TARGET_MS):
+        """
+        Mide esta máquina y elige parámetros del KDF para que desbloquear tarde
+        aproximadamente target_ms. Devuelve (parámetros, milisegundos medidos).
+        """
+        if name not in KDF_DEFAULTS:
+            raise ValueError(f"KDF no soportado: {name}")
+        kdf = dict(name=name, **KDF_DEFAULTS[name])
+        if name == 'pbkdf2-sha256':
+            # Coste lineal en iteraciones: medir una muestra y escalar
+            kdf['iterations'] = 100000
+            elapsed = self._time_kdf(kdf, warmup=True)
+            kdf['iterations'] = max(100000, int(kdf['iterations'] * target_ms / elapsed) // 1000 * 1000)
+        elif name == 'scrypt':
+            # n debe ser potencia de 2: duplicar mientras quepa en el objetivo
+            kdf['n'] = 2 ** 14
+            elapsed = self._time_kdf(kdf, warmup=True)
+            while elapsed * 2 <= target_ms and kdf['n'] < 2 ** 20:
+                kdf['n'] *= 2
+                elapsed = self._time_kdf(kdf)
+        else:
+            # Memoria fija (64 MiB por defecto) y se escalan las pasadas
+            kdf['iterations'] = 1
+            elapsed = self._time_kdf(kdf, warmup=True)
+            while elapsed > target_ms and kdf['memory_cost'] > 8192:
+                kdf['memory_cost'] //= 2
+                elapsed = self._time_kdf(kdf)
+            kdf['iterations'] = max(1, int(target_ms / elapsed))
+        return kdf, self._time_kdf(kdf)
+    
+    def _read_header(self):
+        """Lee la cabecera en claro de vault.enc (None si no existe o es heredado)"""
+        try:
+            with open(self.vault_file, 'rb') as f:
+                first_line = f.readline()
+        except FileNotFoundError:
+            return None
+        if not first_line.startswith(b'{'):
+            return None
+        return json.loads(first_line.decode('utf-8'))
+    
+    def read_kdf(self):
+        """Parámetros del KDF del almacén: cabecera o, en almacenes antiguos, salt.key"""
+        header = self._read_header()
+        if header and 'kdf' in header:
+            kdf = dict(header['kdf'])
+            kdf['salt'] = base64.b64decode(kdf['salt'])
+            return kdf
+        if not os.path.exists(self.salt_file):
+            return None
+        return {'name': 'pbkdf2-sha256', 'iterations': self.iterations, 'salt': self.load_salt()}
+    
+    def is_configured(self):
+        """Indica si existe un almacén con parámetros de KDF conocidos"""
+        return os.path.exists(self.vault_file) and self.read_kdf() is not None
+    
     def encrypt_data(self, data):
         """Cifra los datos usando Fernet"""
         if self.cipher_key is None:
             raise ValueError("Clave de cifrado no disponible")
         
-        fernet = Fernet(self.cipher_key)
+        fernet = _crypto().Fernet(self.cipher_key)
         json_data = json.dumps(data).encode('utf-8')
         encrypted_data = fernet.encrypt(json_data)
         return encrypted_data
@@ -69,28 +400,604 @@ rive_key(self, password, salt):
         if self.cipher_key is None:
             raise ValueError("Clave de cifrado no disponible")
         
-        fernet = Fernet(self.cipher_key)
+        fernet = _crypto().Fernet(self.cipher_key)
         try:
             decrypted_data = fernet.decrypt(encrypted_data)
             return json.loads(decrypted_data.decode('utf-8'))
         except Exception:
             raise ValueError("Error al descifrar: contraseña incorrecta")
     
+    @staticmethod
+    def _derive_field_key(cipher_key):
+        crypto = _crypto()
+        hkdf = crypto.HKDF(algorithm=crypto.hashes.SHA256(), length=32, salt=None, info=b'cerbero-field-v1')
+        return hkdf.derive(base64.urlsafe_b64decode(cipher_key))
+    
+    def _field_cipher(self, nonce):
+        """Cifrador AES-CTR de campos con clave derivada (HKDF) de la del almacén"""
+        if self._field_key is None or self._field_key[0] != self.cipher_key:
+            if self.cipher_key is None:
+                raise ValueError("Clave de cifrado no disponible")
+            self._field_key = (self.cipher_key, self._derive_field_key(self.cipher_key))
+        crypto = _crypto()
+        return crypto.Cipher(crypto.algorithms.AES(self._field_key[1]), crypto.modes.CTR(nonce))
+    
+    def seal_password(self, password):
+        """Cifra una contraseña para guardarla en memoria y en disco"""
+        nonce = secrets.token_bytes(16)
+        encryptor = self._field_cipher(nonce).encryptor()
+        return nonce + encryptor.update(password.encode('utf-8')) + encryptor.finalize()
+    
+    def password_sealer(self):
+        """
+        Devuelve una función que cifra muchas contraseñas con un único flujo
+        AES-CTR: cada una empieza en un bloque nuevo y su nonce es el contador
+        de ese bloque, así que el resultado tiene el formato de seal_password()
+        y se descifra por separado, sin crear un contexto por contraseña.
+        """
+        start = int.from_bytes(secrets.token_bytes(16), 'big')
+        encryptor = self._field_cipher(start.to_bytes(16, 'big')).encryptor()
+        blocks = 0
+        
+        def seal(password):
+            nonlocal blocks
+            data = password.encode('utf-8')
+            nonce = ((start + blocks) % (1 << 128)).to_bytes(16, 'big')
+            ciphertext = encryptor.update(data)
+            padding = -len(data) % 16
+            if padding:
+                encryptor.update(bytes(padding))  # Saltar al siguiente bloque
+            blocks += (len(data) + padding) // 16
+            return nonce + ciphertext
+        
+        return seal
+    
+    @contextlib.contextmanager
+    def reveal_password(self, credential):
+        """Descifra la contraseña en un bytearray que se pone a cero al salir"""
+        nonce, ciphertext = credential.secret[:16], credential.secret[16:]
+        decryptor = self._field_cipher(nonce).decryptor()
+        buffer = bytearray(len(ciphertext) + 15)
+        written = decryptor.update_into(ciphertext, buffer)
+        del buffer[written:]
+        try:
+            yield buffer
+        finally:
+            for i in range(len(buffer)):
+                buffer[i] = 0
+    
+    def _credential_from_record(self, record):
+        """Crea una Credential a partir de un registro (cifrado o heredado en claro)"""
+        if 'secret' in record:
+            secret = base64.b64decode(record['secret'])
+        else:
+            secret = self.seal_password(record['password'])
+        return Credential(record['username'], secret, record.get('account_name'))
+    
+    @staticmethod
+    def _add_postings(index, text, key):
+        for gram in _trigrams(text):
+            index.setdefault(gram, set()).add(key)
+    
+    @staticmethod
+    def _remove_postings(index, text, key):
+        for gram in _trigrams(text):
+            postings = index.get(gram)
+            if postings is not None:
+                postings.discard(key)
+                if not postings:
+                    del index[gram]
+    
+    def _index_site(self, website):
+        """Añade el nombre de un sitio al índice de trigramas"""
+        self._add_postings(self._site_trigrams, website, website)
+    
+    def _unindex_site(self, website):
+        """Quita el nombre de un sitio del índice de trigramas"""
+        self._remove_postings(self._site_trigrams, website, website)
+    
+    def _index_credential(self, website, credential):
+        """Añade una credencial a los índices de búsqueda"""
+        username, account_name = credential.username, credential.account_name
+        identity = (website, username, account_name)
+        self._identity_index[identity] = credential
+        self._add_postings(self._credential_trigrams, username, identity)
+        if account_name:
+            self._add_postings(self._credential_trigrams, account_name, identity)
+        self._username_index.setdefault((website, username), []).append(credential)
+        if account_name:
+            self._account_index.setdefault((website, account_name), []).append(credential)
+    
+    def _unindex_credential(self, website, credential):
+        """Quita una credencial de los índices de búsqueda"""
+        username, account_name = credential.username, credential.account_name
+        identity = (website, username, account_name)
+        self._identity_index.pop(identity, None)
+        self._remove_postings(self._credential_trigrams, username, identity)
+        if account_name:
+            self._remove_postings(self._credential_trigrams, account_name, identity)
+        for index, key in ((self._username_index, (website, username)),
+                           (self._account_index, (website, account_name))):
+            bucket = index.get(key)
+            if bucket is None:
+                continue
+            bucket.remove(credential)
+            if not bucket:
+                del index[key]
+    
+    def _rebuild_indexes(self):
+        """Reconstruye los índices a partir de vault_data"""
+        self._identity_index = {}
+        self._username_index = {}
+        self._account_index = {}
+        self._site_trigrams = {}
+        self._credential_trigrams = {}
+        for website, credentials in self.vault_data.items():
+            self._index_site(website)
+            for credential in credentials:
+                self._index_credential(website, credential)
+    
+    def _insert_credential(self, website, credential):
+        """Inserta una credencial nueva en vault_data y en los índices"""
+        if website not in self.vault_data:
+            self.vault_data[website] = []
+            self._index_site(website)
+        self.vault_data[website].append(credential)
+        self._index_credential(website, credential)
+    
+    def _unlink_credential(self, website, credential):
+        """Quita una credencial de vault_data y de los índices"""
+        credentials = self.vault_data[website]
+        credentials.remove(credential)
+        if not credentials:
+            del self.vault_data[website]
+            self._unindex_site(website)
+        self._unindex_credential(website, credential)
+    
+    def _find_credential(self, website, username, account_name):
+        """Busca una credencial por su identidad (usuario, nombre de cuenta)"""
+        return self._identity_index.get((website, username, account_name))
+    
+    def _record_put(self, website, credential):
+        """Registra en el journal el alta o actualización de una credencial"""
+        self._pending_ops.append({'op': 'put', 'site': website, 'credential': credential.to_record()})
+    
+    def _record_delete(self, website, credential):
+        """Registra en el journal la eliminación de una credencial"""
+        self._pending_ops.append({
+            'op': 'delete',
+            'site': website,
+            'username': credential.username,
+            'account_name': credential.account_name,
+        })
+    
+    def _apply_ops(self, ops):
+        """Aplica operaciones del journal sobre vault_data (idempotente por identidad)"""
+        for op in ops:
+            website = op['site']
+            if op['op'] == 'put':
+                credential = self._credential_from_record(op['credential'])
+                existing = self._find_credential(website, credential.username, credential.account_name)
+                if existing is not None:
+                    existing.secret = credential.secret
+                else:
+                    self._insert_credential(website, credential)
+            elif op['op'] == 'delete':
+                existing = self._find_credential(website, op['username'], op.get('account_name'))
+                if existing is not None:
+                    self._unlink_credential(website, existing)
+    
+    @staticmethod
+    def _op_identity(op):
+        """Identidad (sitio, usuario, cuenta) afectada por una operación del journal"""
+        if op['op'] == 'put':
+            return op['site'], op['credential']['username'], op['credential'].get('account_name')
+        return op['site'], op['username'], op.get('account_name')
+    
+    def _vault_header(self, generation=None):
+        """Cabecera en claro del formato segmentado"""
+        header = {'format': VAULT_FORMAT, 'version': VAULT_FORMAT_VERSION}
+        if generation is not None:
+            header['generation'] = generation
+        if self.vault_kdf is not None:
+            header['kdf'] = self._kdf_to_header(self.vault_kdf)
+        return json.dumps(header).encode('utf-8') + b'\n'
+    
+    @staticmethod
+    def _kdf_to_header(kdf):
+        """Parámetros del KDF serializables en una cabecera JSON (sal en base64)"""
+        return dict(kdf, salt=base64.b64encode(kdf['salt']).decode('ascii'))
+    
+    def _encode_snapshot(self, snapshot, generation=None):
+        """Cifra una instantánea del almacén como segmentos, uno por sitio"""
+        records = [self._vault_header(generation), self.encrypt_data({'type': 'meta'}) + b'\n']
+        for website, credentials in snapshot.items():
+            segment = {'type': 'segment', 'site': website,
+                       'credentials': [credential.to_record() for credential in credentials]}
+            records.append(self.encrypt_data(segment) + b'\n')
+        return b''.join(records)
+    
+    def _fsync_directory(self):
+        """Sincroniza el directorio del almacén para que el renombrado sea duradero"""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.vault_file)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    @contextlib.contextmanager
+    def _vault_lock(self, exclusive):
+        """
+        Bloqueo consultivo entre procesos: compartido para leer, exclusivo para
+        escribir. Se toma sobre vault.enc.lock porque vault.enc se reemplaza al
+        compactar y un bloqueo sobre el inodo antiguo no protegería al nuevo.
+        """
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.vault_file + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            os.close(fd)  # Cerrar el descriptor libera el bloqueo
+    
+    def _remember_disk_state(self, offset, generation):
+        """Anota qué versión del archivo refleja la memoria (con el bloqueo tomado)"""
+        st = os.stat(self.vault_file)
+        with self._disk_lock:
+            self._disk_state = (st.st_ino, st.st_size, st.st_mtime_ns)
+            self._disk_offset = offset
+            self._disk_generation = generation
+    
+    def _disk_changed(self):
+        """Indica si vault.enc cambió desde la última sincronización (un solo stat)"""
+        try:
+            st = os.stat(self.vault_file)
+        except FileNotFoundError:
+            return self._disk_state is not None
+        with self._disk_lock:
+            return self._disk_state != (st.st_ino, st.st_size, st.st_mtime_ns)
+    
+    def _write_snapshot(self, snapshot):
+        """Escribe una instantánea completa: archivo temporal, fsync y renombrado atómico"""
+        generation = secrets.token_hex(8)
+        data = self._encode_snapshot(snapshot, generation)
+        tmp_file = self.vault_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.vault_file)
+        self._fsync_directory()
+        self._journal_records = 0
+        self._vault_format = 'segmented'
+        self._remember_disk_state(len(data), generation)
+    
+    def _repair_tail(self, f):
+        """Descarta una escritura incompleta al final del archivo (con bloqueo exclusivo)"""
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b'\n':
+            return
+        cut, pos = 0, end
+        while pos > 0:
+            start = max(0, pos - 65536)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b'\n')
+            if newline >= 0:
+                cut = start + newline + 1
+                break
+            pos = start
+        f.truncate(cut)
+        f.seek(cut)
+        # Avisos a stderr: en modo lote stdout solo lleva JSON (y esto puede correr en el hilo de escritura)
+        print("⚠️  Se descartó una escritura incompleta al final del almacén.", file=sys.stderr)
+    
+    def _append_journal(self, ops):
+        """Añade un registro de journal con varias operaciones y lo sincroniza"""
+        record = self.encrypt_data({'type': 'journal', 'ops': ops})
+        # Si otro proceso escribió antes, la memoria no refleja sus cambios: el
+        # registro se añade igualmente (las operaciones se aplican por identidad)
+        # y refresh() leerá la cola desde el último punto sincronizado
+        in_sync = not self._disk_changed()
+        with open(self.vault_file, 'r+b') as f:
+            self._repair_tail(f)
+            f.write(record + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+            end = f.tell()
+        self._journal_records += 1
+        if in_sync:
+            self._remember_disk_state(end, self._disk_generation)
+    
+    def _write_items(self, items):
+        """Escribe en orden las tareas encoladas, fusionando operaciones consecutivas"""
+        ops = []
+        with self._vault_lock(exclusive=True):
+            for kind, payload in items:
+                if kind == 'ops':
+                    ops.extend(payload)
+                    continue
+                snapshot, required = payload
+                self._snapshot_queued = False
+                if not required and self._disk_changed():
+                    # Otro proceso escribió desde la última sincronización: la
+                    # instantánea perdería sus cambios, así que se aplaza la
+                    # compactación y las operaciones van al journal
+                    continue
+                # La instantánea ya incluye las operaciones anteriores
+                ops = []
+                self._write_snapshot(snapshot)
+            if ops:
+                self._append_journal(ops)
+    
+    def _writer_loop(self):
+        """
+        Hilo de persistencia: agrupa ráfagas de cambios en una sola escritura.
+        Si una escritura falla (disco lleno, E/S, bloqueo), las tareas vuelven al
+        principio de la cola y no se marcan como duraderas: flush() lanza el
+        error y se reintentan pasado retry_delay.
+        """
+        failed = False
+        while True:
+            with self._writer_cond:
+                while not self._write_queue and not self._writer_stop:
+                    self._writer_cond.wait()
+                if not self._write_queue:
+                    return
+                # Debounce: esperar a que termine la ráfaga salvo que se pida flush
+                # (tras un fallo se espera retry_delay aunque se pida)
+                deadline = time.monotonic() + (self.retry_delay if failed else self.save_delay)
+                while (failed or not self._flush_requested) and not self._writer_stop:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._writer_cond.wait(remaining)
+                items, self._write_queue = self._write_queue, []
+                target_seq = self._enqueued_seq
+            try:
+                self._write_items(items)
+            except Exception as e:
+                with self._writer_cond:
+                    self._write_queue[:0] = items
+                    self._writer_error = e
+                    self._writer_cond.notify_all()
+                    if failed and self._writer_stop:
+                        return  # Al cerrar no se reintenta indefinidamente
+                failed = True
+                continue
+            failed = False
+            with self._writer_cond:
+                self._durable_seq = target_seq
+                self._writer_cond.notify_all()
+    
+    def _enqueue_write(self, kind, payload):
+        """Encola una tarea para el hilo de persistencia (lo arranca si hace falta)"""
+        with self._writer_cond:
+            if self._writer_thread is None or not self._writer_thread.is_alive():
+                self._writer_stop = False
+                self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+                self._writer_thread.start()
+                if not self._atexit_registered:
+                    atexit.register(self.flush)
+                    self._atexit_registered = True
+            self._write_queue.append((kind, payload))
+            self._enqueued_seq += 1
+            self._writer_cond.notify_all()
+    
+    def flush(self):
+        """Espera a que todos los cambios encolados estén escritos y sincronizados"""
+        if self._pending_ops and not self._batch_depth:
+            self.save_vault()
+        self.wait_durable()
+    
+    def wait_durable(self):
+        """Espera a que lo ya encolado sea duradero (sin tocar cambios pendientes; apto para otro hilo)"""
+        with self._writer_cond:
+            target_seq = self._enqueued_seq
+            self._flush_requested = True
+            self._writer_cond.notify_all()
+            while self._durable_seq < target_seq and self._writer_error is None \
+                    and self._writer_thread is not None and self._writer_thread.is_alive():
+                self._writer_cond.wait()
+            self._flush_requested = False
+            error, self._writer_error = self._writer_error, None
+        if error is not None:
+            raise error
+    
+    def compact_vault(self, required=False):
+        """
+        Reescribe el almacén como segmentos por sitio, vaciando el journal (síncrono).
+        :param required: escribir la instantánea aunque otro proceso haya modificado
+                         el archivo (almacén nuevo, migración o cambio de clave).
+        """
+        if self._vault_format == 'segmented' and not required:
+            # Incorporar antes los cambios de otros procesos; si aun así el archivo
+            # cambia, el hilo de escritura conserva los cambios en el journal
+            self.refresh()
+        else:
+            required = True
+        ops, self._pending_ops = self._pending_ops, []
+        self._snapshot_queued = True
+        # Operaciones e instantánea en la misma pasada del hilo de escritura:
+        # si la instantánea se escribe, las operaciones no llegan al journal
+        with self._writer_cond:
+            if ops and not required:
+                self._enqueue_write('ops', ops)
+            self._enqueue_write('snapshot', (self._snapshot(), required))
+        self.flush()
+    
+    def _snapshot(self):
+        """Copia superficial del almacén; las operaciones posteriores van al journal"""
+        return {website: list(credentials) for website, credentials in self.vault_data.items()}
+    
+    def _maybe_compact(self):
+        """Encola una compactación si el journal es demasiado largo"""
+        if self._snapshot_queued:
+            return
+        if self._journal_records < max(self.compaction_min_records, len(self.vault_data)):
+            return
+        self._snapshot_queued = True
+        self._enqueue_write('snapshot', (self._snapshot(), False))
+    
+    def _mutated(self):
+        """Persiste un cambio salvo que haya un lote en curso"""
+        if not self._batch_depth:
+            self.save_vault()
+    
+    @contextlib.contextmanager
+    def batch(self):
+        """Agrupa mutaciones: se escriben en un único registro al salir del bloque"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.save_vault()
+    
     def save_vault(self):
-        """Guarda el almacén cifrado en el archivo vault.enc"""
-        encrypted_data = self.encrypt_data(self.vault_data)
-        with open(self.vault_file, 'wb') as f:
-            f.write(encrypted_data)
+        """
+        Guarda los cambios pendientes. La escritura (un registro de journal con
+        fsync) ocurre en segundo plano; usa flush() para esperar a que sea duradera.
+        """
+        if self._vault_format != 'segmented':
+            # Almacén nuevo o heredado: escribir el formato segmentado completo
+            self.compact_vault()
+            return
+        if not self._pending_ops:
+            return
+        ops, self._pending_ops = self._pending_ops, []
+        self._enqueue_write('ops', ops)
+        self._maybe_compact()
+        if not self.async_persistence:
+            self.flush()
+    
+    def _load_segmented(self, raw):
+        """Reconstruye vault_data a partir de segmentos y journal"""
+        lines = raw.split(b'\n')
+        header = json.loads(lines[0].decode('utf-8'))
+        if header.get('format') != VAULT_FORMAT or header.get('version') != VAULT_FORMAT_VERSION:
+            raise ValueError("Formato de almacén no soportado")
+        if 'kdf' in header:
+            self.vault_kdf = dict(header['kdf'], salt=base64.b64decode(header['kdf']['salt']))
+        # La última línea sin salto final es una escritura incompleta: se ignora
+        # y el siguiente escritor la recorta con el bloqueo exclusivo
+        records = lines[1:-1]
+        if lines[-1]:
+            print("⚠️  Se ignoró una escritura incompleta al final del almacén.", file=sys.stderr)
+        if not records:
+            raise ValueError("Almacén vacío o dañado")
+        self.vault_data = {}
+        self._rebuild_indexes()
+        self._journal_records = 0
+        for token in records:
+            record = self.decrypt_data(token)
+            if record['type'] == 'segment':
+                website = record['site']
+                credentials = [self._credential_from_record(item) for item in record['credentials']]
+                self.vault_data[website] = credentials
+                self._index_site(website)
+                for credential in credentials:
+                    self._index_credential(website, credential)
+            elif record['type'] == 'journal':
+                self._apply_ops(record['ops'])
+                self._journal_records += 1
+        self._remember_disk_state(len(raw) - len(lines[-1]), header.get('generation'))
+    
+    def _load_tail(self, tail, offset):
+        """Aplica los registros de journal añadidos tras `offset`; devuelve sus operaciones"""
+        end = tail.rfind(b'\n') + 1
+        ops = []
+        for token in tail[:end].split(b'\n')[:-1]:
+            record = self.decrypt_data(token)
+            if record['type'] == 'journal':
+                ops.extend(record['ops'])
+                self._journal_records += 1
+        self._apply_ops(ops)
+        self._remember_disk_state(offset + end, self._disk_generation)
+        return ops
+    
+    def refresh(self):
+        """
+        Incorpora los cambios escritos por otros procesos. Si el archivo no cambió
+        solo cuesta un stat; si solo creció se descifran únicamente los registros
+        nuevos del journal, y tras una compactación ajena se recarga entero.
+        Los cambios locales pendientes (dentro de un lote) se reaplican encima.
+        Devuelve True si se aplicaron cambios.
+        """
+        if self._disk_state is None or not self._disk_changed():
+            return False
+        if not self._batch_depth:
+            self.flush()
+            if not self._disk_changed():
+                return False
+        remote_ops = None
+        with self._vault_lock(exclusive=False):
+            with self._disk_lock:
+                inode, offset, generation = self._disk_state[0], self._disk_offset, self._disk_generation
+            with open(self.vault_file, 'rb') as f:
+                header = json.loads(f.readline().decode('utf-8'))
+                st = os.fstat(f.fileno())
+                appended = (st.st_ino == inode and header.get('generation') == generation
+                            and st.st_size >= offset)
+                f.seek(offset if appended else 0)
+                raw = f.read()
+            if appended:
+                remote_ops = self._load_tail(raw, offset)
+            else:
+                self._load_segmented(raw)
+        # Fusión optimista: las operaciones ajenas y las locales se aplican por
+        # identidad, así que solo chocan si tocan la misma credencial
+        pending = self._pending_ops
+        if pending:
+            self._apply_ops(pending)
+            if remote_ops:
+                conflicts = {self._op_identity(op) for op in pending} & {self._op_identity(op) for op in remote_ops}
+                if conflicts:
+                    print(f"⚠️  {len(conflicts)} credencial(es) modificada(s) también por otro proceso: "
+                          "se conservan los cambios locales.", file=sys.stderr)
+        return True
     
     def load_vault(self):
-        """Carga y descifra el almacén desde vault.enc"""
+        """Carga y descifra el almacén desde vault.enc (migra el formato heredado)"""
         try:
-            with open(self.vault_file, 'rb') as f:
-                encrypted_data = f.read()
-            self.vault_data = self.decrypt_data(encrypted_data)
+            with self._vault_lock(exclusive=False), open(self.vault_file, 'rb') as f:
+                raw = f.read()
+                if raw.startswith(b'{'):
+                    self._pending_ops = []
+                    self._snapshot_queued = False
+                    self._load_segmented(raw)
+                    self._vault_format = 'segmented'
+                    return
         except FileNotFoundError:
             print("❌ Error: Archivo de almacén no encontrado. Ejecuta la configuración inicial.")
             sys.exit(1)
+        self._pending_ops = []
+        self._snapshot_queued = False
+        # Formato heredado: un único blob Fernet con todo el almacén
+        self.vault_data = {website: [self._credential_from_record(item) for item in credentials]
+                           for website, credentials in self.decrypt_data(raw).items()}
+        self._rebuild_indexes()
+        self._vault_format = 'legacy'
+        self._disk_state = None
+        self.compact_vault()
+        print("🔄 Almacén migrado al formato segmentado.")
+    
+    def close(self):
+        """Escribe los cambios pendientes y detiene el hilo de persistencia"""
+        self.flush()
+        with self._writer_cond:
+            self._writer_stop = True
+            self._writer_cond.notify_all()
+        if self._writer_thread is not None:
+            self._writer_thread.join()
+            self._writer_thread = None
     
     def setup_initial_configuration(self):
         """Configuración inicial del sistema"""
@@ -98,7 +1005,7 @@ rive_key(self, password, salt):
         print("=" * 60)
         
         # Verificar si ya existe configuración
-        if os.path.exists(self.vault_file) or os.path.exists(self.salt_file):
+        if os.path.exists(self.vault_file):
             print("⚠️  Ya existe una configuración. ¿Deseas sobrescribirla? (s/N): ", end="")
             response = input().lower()
             if response != 's':
@@ -118,81 +1025,389 @@ rive_key(self, password, salt):
                 continue
             break
         
-        # Generar y guardar sal
+        # Generar sal y derivar clave; ambos parámetros van en la cabecera
         salt = self.generate_salt()
-        self.save_salt(salt)
-        
-        # Derivar clave y configurar cifrado
-        self.cipher_key = self.derive_key(master_password, salt)
+        self.vault_kdf = dict(self.default_kdf(), salt=salt)
+        self.cipher_key = self.derive_key(master_password, salt, self.vault_kdf)
         
         # Crear almacén vacío
         self.vault_data = {}
+        self._rebuild_indexes()
+        self._vault_format = None
         self.save_vault()
         
         print("✅ Configuración completada exitosamente.")
-        print(f"📁 Archivos creados: {self.vault_file}, {self.salt_file}")
+        print(f"📁 Archivo creado: {self.vault_file} (KDF: {self.vault_kdf['name']})")
         return True
     
+    def agent_vault_id(self, salt):
+        """Identificador del almacén en el agente: ruta absoluta y huella de la sal"""
+        return f"{os.path.abspath(self.vault_file)}#{hashlib.sha256(salt).hexdigest()[:16]}"
+    
+    def unlock_with_agent(self, salt):
+        """Intenta desbloquear con la clave cacheada por el agente"""
+        if not self.use_agent:
+            return False
+        cached_key = _agent().get_key(self.agent_vault_id(salt))
+        if cached_key is None:
+            return False
+        self.cipher_key = cached_key
+        try:
+            self.load_vault()
+            return True
+        except ValueError:
+            # Clave obsoleta (p. ej. tras reconfigurar): olvidarla y pedir contraseña
+            _agent().lock(self.agent_vault_id(salt))
+            self.cipher_key = None
+            return False
+    
+    def lock_agent(self):
+        """Pide al agente que olvide la clave de este almacén"""
+        kdf = self.read_kdf()
+        if kdf is None:
+            print("❌ Sistema no configurado.")
+            return
+        if _agent().lock(self.agent_vault_id(kdf['salt'])):
+            print("🔒 El agente ha olvidado la clave del almacén.")
+        else:
+            print("❌ No hay ningún agente en ejecución.")
+    
     def unlock_vault(self):
         """Desbloquea el almacén con la contraseña maestra"""
-        if not os.path.exists(self.vault_file) or not os.path.exists(self.salt_file):
+        kdf = self.read_kdf() if os.path.exists(self.vault_file) else None
+        if kdf is None:
             print("❌ Sistema no configurado. Ejecuta la configuración inicial primero.")
             return False
+        self.vault_kdf = kdf
+        
+        # Primero intentar con el agente de claves, si está en ejecución
+        salt = kdf['salt']
+        if self.unlock_with_agent(salt):
+            print("✅ Almacén desbloqueado exitosamente (agente).")
+            return True
         
         # Solicitar contraseña maestra
         master_password = getpass.getpass("🔐 Ingresa tu contraseña maestra: ")
         
-        # Cargar sal y derivar clave
-        salt = self.load_salt()
-        self.cipher_key = self.derive_key(master_password, salt)
+        # Derivar clave con los parámetros guardados en el almacén
+        self.cipher_key = self.derive_key(master_password, salt, kdf)
         
         # Intentar descifrar el almacén
         try:
             self.load_vault()
             print("✅ Almacén desbloqueado exitosamente.")
-            return True
         except ValueError as e:
             print(f"❌ {e}")
             return False
+        if self.use_agent:
+            _agent().add_key(self.agent_vault_id(salt), self.cipher_key, self.agent_timeout)
+        return True
+    
+    def rekey_vault(self, new_password, kdf):
+        """Vuelve a cifrar el almacén con una contraseña y/o parámetros de KDF nuevos"""
+        self.flush()
+        self.refresh()
+        salt = self.generate_salt()
+        new_kdf = dict(kdf, salt=salt)
+        new_key = self.derive_key(new_password, salt, new_kdf)
+        new_field_key = self._derive_field_key(new_key)
+        # Preparar todos los secretos antes de tocar el estado, por si algo falla
+        resealed = []
+        crypto = _crypto()
+        for credentials in self.vault_data.values():
+            for credential in credentials:
+                nonce = secrets.token_bytes(16)
+                cipher = crypto.Cipher(crypto.algorithms.AES(new_field_key), crypto.modes.CTR(nonce))
+                encryptor = cipher.encryptor()
+                with self.reveal_password(credential) as password:
+                    resealed.append((credential, nonce + encryptor.update(password) + encryptor.finalize()))
+        old_salt = self.vault_kdf['salt'] if self.vault_kdf else None
+        for credential, secret in resealed:
+            credential.secret = secret
+        self.cipher_key = new_key
+        self.vault_kdf = new_kdf
+        self.compact_vault(required=True)
+        if self.use_agent:
+            if old_salt is not None:
+                _agent().lock(self.agent_vault_id(old_salt))
+            _agent().add_key(self.agent_vault_id(salt), new_key, self.agent_timeout)
+    
+    def calibrate(self, name='pbkdf2-sha256', target_ms=DEFAULT_UNLOCK_TARGET_MS, offer_apply=True):
+        """
+        Calibra el KDF y lo deja como predeterminado para setup en esta
+        sesión. El resultado solo vive en memoria (un 'calibrate' suelto lo
+        perdería al terminar), así que ofrece aplicarlo en el momento.
+        """
+        print(f"⏱️  Calibrando {name} para ~{target_ms} ms por desbloqueo...")
+        try:
+            kdf, elapsed = self.calibrate_kdf(name, target_ms)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return None
+        params = ', '.join(f"{k}={v}" for k, v in kdf.items() if k != 'name')
+        print(f"✅ {name}: {params} ({elapsed:.0f} ms medidos)")
+        self.kdf_settings = kdf
+        if offer_apply:
+            self._offer_calibrated_kdf(kdf, target_ms)
+        return kdf
+    
+    def _offer_calibrated_kdf(self, kdf, target_ms):
+        """Aplica el KDF calibrado: recifra el almacén (rekey) o lo crea (setup) si no existe"""
+        configured = self.is_configured()
+        action = "recifrar el almacén" if configured else "crear el almacén"
+        print(f"¿Deseas {action} ahora con estos parámetros? (s/N): ", end="")
+        response = input().lower()
+        if response != 's':
+            print(f"ℹ️  Parámetros sin aplicar. Más adelante: 'rekey {kdf['name']} {target_ms}' (vuelve a medir).")
+            return
+        if not configured:
+            self.setup_initial_configuration()
+        elif self.cipher_key is not None or self.unlock_vault():
+            self.rekey(kdf=kdf)
+    
+    def rekey(self, name=None, target_ms=DEFAULT_UNLOCK_TARGET_MS, kdf=None):
+        """
+        Cambia la contraseña maestra y/o el KDF del almacén desbloqueado. Sin
+        nombre de KDF (ni parámetros ya calibrados) conserva el KDF actual.
+        """
+        current_password = getpass.getpass("🔐 Contraseña maestra actual: ")
+        current_key = self.derive_key(current_password, self.vault_kdf['salt'], self.vault_kdf)
+        if not hmac.compare_digest(current_key, self.cipher_key):
+            print("❌ Contraseña incorrecta.")
+            return False
+        new_password = getpass.getpass("🔐 Nueva contraseña maestra (vacío para mantenerla): ")
+        if new_password:
+            if len(new_password) < 8:
+                print("❌ La contraseña debe tener al menos 8 caracteres.")
+                return False
+            if getpass.getpass("🔐 Confirma la nueva contraseña: ") != new_password:
+                print("❌ Las contraseñas no coinciden.")
+                return False
+        else:
+            new_password = current_password
+        if kdf is None and name is not None:
+            kdf = self.calibrate(name, target_ms, offer_apply=False)
+            if kdf is None:
+                return False
+        elif kdf is None:
+            kdf = {k: v for k, v in self.vault_kdf.items() if k != 'salt'}
+        self.rekey_vault(new_password, kdf)
+        print(f"✅ Almacén recifrado con {kdf['name']}.")
+        return True
+    
+    def store_credential(self, website, username, password, account_name=None, overwrite=False):
+        """
+        Añade o actualiza una credencial sin interacción.
+        Devuelve 'added', 'updated' o 'exists' (si ya existe y overwrite es False).
+        """
+        account_name = account_name or None
+        self.refresh()
+        existing = self._find_credential(website, username, account_name)
+        if existing is not None:
+            if not overwrite:
+                return 'exists'
+            existing.secret = self.seal_password(password)
+            self._record_put(website, existing)
+            self._mutated()
+            return 'updated'
+        
+        credential = Credential(username, self.seal_password(password), account_name)
+        
+        self._insert_credential(website, credential)
+        self._record_put(website, credential)
+        self._mutated()
+        return 'added'
+    
+    def find_credentials(self, website, identifier=None):
+        """Devuelve las credenciales de un sitio que coinciden con el usuario o nombre de cuenta"""
+        self.refresh()
+        if identifier is None:
+            return list(self.vault_data.get(website, []))
+        by_username = self._username_index.get((website, identifier), [])
+        by_account = self._account_index.get((website, identifier), [])
+        if not by_account:
+            return list(by_username)
+        return by_username + [cred for cred in by_account if cred not in by_username]
+    
+    def search(self, query, limit=20):
+        """
+        Búsqueda difusa en sitios, usuarios y nombres de cuenta mediante el
+        índice de trigramas. Devuelve tuplas (puntuación, sitio, credencial)
+        ordenadas de mayor a menor relevancia.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        self.refresh()
+        grams = _trigrams(query)
+        min_hits = max(1, (len(grams) + 1) // 2)
+        
+        def score(text):
+            # Coeficiente de Dice sobre trigramas, con bonificación por prefijo/subcadena
+            if not text:
+                return 0.0
+            text = text.lower()
+            text_grams = _trigrams(text)
+            bonus = 1.0 if text == query else 0.5 if text.startswith(query) else 0.25 if query in text else 0.0
+            return 2 * len(grams & text_grams) / (len(grams) + len(text_grams)) + bonus
+        
+        def count_hits(index):
+            # Un candidato con min_hits aciertos aparece por fuerza en alguno de
+            # los len(grams) - min_hits + 1 trigramas más raros: solo esos se
+            # recorren y el resto se comprueba por pertenencia.
+            postings = sorted((index.get(gram, set()) for gram in grams), key=len)
+            rare = len(postings) - min_hits + 1
+            hits = collections.Counter()
+            for posting in postings[:rare]:
+                hits.update(posting)
+            for posting in postings[rare:]:
+                hits.update(hits.keys() & posting)
+            return {key: count for key, count in hits.items() if count >= min_hits}
+        
+        site_hits = count_hits(self._site_trigrams)
+        credential_hits = count_hits(self._credential_trigrams)
+        
+        # Puntuación exacta por campo solo para los candidatos con más aciertos
+        scores = {}
+        shortlist = heapq.nlargest(max(limit * 10, 100), credential_hits.items(), key=lambda item: item[1])
+        for (website, username, account_name), _ in shortlist:
+            scores[(website, username, account_name)] = max(score(username), score(account_name))
+        
+        # Las coincidencias por sitio se expanden a sus credenciales, de mejor a peor
+        ranked_sites = sorted(((score(website), website) for website in site_hits), reverse=True)
+        expanded = 0
+        for site_score, website in ranked_sites:
+            if expanded >= limit:
+                break
+            for credential in self.vault_data.get(website, []):
+                identity = (website, credential.username, credential.account_name)
+                scores[identity] = max(scores.get(identity, 0.0), site_score)
+                expanded += 1
+                if expanded >= limit:
+                    break
+        
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(round(value, 3), identity[0], self._identity_index[identity]) for identity, value in best]
+    
+    def search_credentials(self, query, limit=20):
+        """Muestra los resultados de una búsqueda difusa"""
+        results = self.search(query, limit)
+        if not results:
+            print(f"❌ Sin resultados para '{query}'.")
+            return
+        print(f"🔎 {len(results)} resultado(s) para '{query}':")
+        for i, (value, website, credential) in enumerate(results, 1):
+            account_info = f" ({credential.account_name})" if credential.account_name else ""
+            print(f"  {i}. 🌐 {website} 👤 {credential.username}{account_info}  [{value}]")
+    
+    def audit(self, breach_file=None, workers=None, weak_score=1):
+        """
+        Audita todo el almacén sin escribir nada en disco:
+        - reutilización: índice de hashes con clave (BLAKE2b) efímera, O(n);
+        - fortaleza: puntuación 0-4 repartida en un pool de procesos;
+        - filtraciones: SHA-1 buscado en una lista local ordenada (opcional).
+        Devuelve un informe con los grupos reutilizados, las débiles y las filtradas.
+        """
+        start = time.perf_counter()
+        self.refresh()
+        audit_key = secrets.token_bytes(32)  # Los hashes no sirven fuera de esta auditoría
+        identities, passwords, sha1s, by_digest = [], [], [], {}
+        for website, credential in self.iter_credentials():
+            identity = (website, credential.username, credential.account_name)
+            with self.reveal_password(credential) as password:
+                digest = hashlib.blake2b(password, key=audit_key, digest_size=16).digest()
+                if breach_file:
+                    sha1s.append(hashlib.sha1(password).hexdigest().upper().encode('ascii'))
+                passwords.append(password.decode('utf-8', 'replace'))
+            by_digest.setdefault(digest, []).append(identity)
+            identities.append(identity)
+        breached = []
+        if breach_file:
+            with _audit().BreachList(breach_file) as breaches:
+                breached = [identity + (occurrences,)
+                            for identity, occurrences in zip(identities, breaches.count_many(sha1s))
+                            if occurrences]
+            del sha1s
+        scores = _audit().score_all(passwords, workers)
+        del passwords
+        reused = sorted((group for group in by_digest.values() if len(group) > 1), key=len, reverse=True)
+        weak = [identity + result for identity, result in zip(identities, scores) if result[0] <= weak_score]
+        return {
+            'total': len(identities),
+            'reused': reused,
+            'weak': weak,
+            'breached': breached,
+            'scores': collections.Counter(result[0] for result in scores),
+            'seconds': time.perf_counter() - start,
+        }
+    
+    def audit_vault(self, breach_file=None, limit=20):
+        """Muestra el informe de auditoría (los primeros `limit` elementos de cada sección)"""
+        try:
+            report = self.audit(breach_file)
+        except OSError as e:
+            print(f"❌ No se pudo abrir la lista de filtraciones: {e}")
+            return None
+        
+        def label(website, username, account_name):
+            account_info = f" ({account_name})" if account_name else ""
+            return f"🌐 {website} 👤 {username}{account_info}"
+        
+        def more(items):
+            if len(items) > limit:
+                print(f"   ... y {len(items) - limit} más")
+        
+        print(f"🩺 Auditoría de {report['total']} credenciales ({report['seconds']:.2f} s)")
+        histogram = ', '.join(f"{score}: {report['scores'].get(score, 0)}" for score in range(5))
+        print(f"   Fortaleza (0 muy débil - 4 muy fuerte): {histogram}")
+        print(f"\n♻️  Contraseñas reutilizadas: {len(report['reused'])} grupo(s)")
+        for group in report['reused'][:limit]:
+            print(f"   {len(group)} credenciales: " + ', '.join(label(*identity) for identity in group[:5])
+                  + (' ...' if len(group) > 5 else ''))
+        more(report['reused'])
+        print(f"\n⚠️  Contraseñas débiles: {len(report['weak'])}")
+        for website, username, account_name, score, bits, reasons in report['weak'][:limit]:
+            print(f"   {label(website, username, account_name)}  [{score}/4, {bits:.0f} bits] {', '.join(reasons)}")
+        more(report['weak'])
+        if breach_file:
+            print(f"\n🚨 Contraseñas filtradas: {len(report['breached'])}")
+            for website, username, account_name, occurrences in report['breached'][:limit]:
+                print(f"   {label(website, username, account_name)}  (vista {occurrences} veces)")
+            more(report['breached'])
+        return report
+    
+    def remove_credential(self, website, credential):
+        """Elimina una credencial concreta sin interacción"""
+        self._unlink_credential(website, credential)
+        self._record_delete(website, credential)
+        self._mutated()
     
     def add_credential(self, website, username, password, account_name=None):
         """Añade una nueva credencial al almacén"""
-        # Inicializar estructura si el sitio no existe
-        if website not in self.vault_data:
-            self.vault_data[website] = []
-        
+        self.refresh()
         # Verificar si ya existe esta combinación usuario/nombre de cuenta
-        for existing in self.vault_data[website]:
-            if existing['username'] == username and existing.get('account_name') == account_name:
-                print(f"⚠️  Ya existe una credencial para '{username}' en '{website}'", end="")
-                if account_name:
-                    print(f" (cuenta: {account_name})", end="")
-                print(". ¿Deseas sobrescribirla? (s/N): ", end="")
-                response = input().lower()
-                if response != 's':
-                    print("Operación cancelada.")
-                    return
-                # Actualizar credencial existente
-                existing['password'] = password
-                self.save_vault()
-                print(f"✅ Credencial actualizada exitosamente.")
+        if self._find_credential(website, username, account_name or None) is not None:
+            print(f"⚠️  Ya existe una credencial para '{username}' en '{website}'", end="")
+            if account_name:
+                print(f" (cuenta: {account_name})", end="")
+            print(". ¿Deseas sobrescribirla? (s/N): ", end="")
+            response = input().lower()
+            if response != 's':
+                print("Operación cancelada.")
                 return
+            # Actualizar credencial existente
+            self.store_credential(website, username, password, account_name, overwrite=True)
+            print(f"✅ Credencial actualizada exitosamente.")
+            return
         
         # Añadir nueva credencial
-        credential = {
-            'username': username,
-            'password': password
-        }
-        if account_name:
-            credential['account_name'] = account_name
-        
-        self.vault_data[website].append(credential)
-        self.save_vault()
+        self.store_credential(website, username, password, account_name)
         account_info = f" (cuenta: {account_name})" if account_name else ""
         print(f"✅ Credencial para '{website}'{account_info} añadida exitosamente.")
     
     def get_credential(self, website, identifier=None):
         """Obtiene una credencial y la copia al portapapeles"""
+        self.refresh()
         if website not in self.vault_data:
             print(f"❌ No se encontró credencial para '{website}'.")
             return
@@ -210,8 +1425,8 @@ rive_key(self, password, salt):
             if identifier is None:
                 print(f"🔍 Múltiples cuentas encontradas para '{website}':")
                 for i, cred in enumerate(credentials, 1):
-                    account_info = f" ({cred['account_name']})" if cred.get('account_name') else ""
-                    print(f"  {i}. {cred['username']}{account_info}")
+                    account_info = f" ({cred.account_name})" if cred.account_name else ""
+                    print(f"  {i}. {cred.username}{account_info}")
                 
                 while True:
                     try:
@@ -229,11 +1444,7 @@ rive_key(self, password, salt):
                         print("❌ Por favor ingresa un número válido.")
             else:
                 # Buscar por identificador (usuario o nombre de cuenta)
-                found_credentials = []
-                for cred in credentials:
-                    if (cred['username'] == identifier or 
-                        cred.get('account_name') == identifier):
-                        found_credentials.append(cred)
+                found_credentials = self.find_credentials(website, identifier)
                 
                 if not found_credentials:
                     print(f"❌ No se encontró credencial para '{identifier}' en '{website}'.")
@@ -243,8 +1454,8 @@ rive_key(self, password, salt):
                 else:
                     print(f"🔍 Múltiples coincidencias encontradas:")
                     for i, cred in enumerate(found_credentials, 1):
-                        account_info = f" ({cred['account_name']})" if cred.get('account_name') else ""
-                        print(f"  {i}. {cred['username']}{account_info}")
+                        account_info = f" ({cred.account_name})" if cred.account_name else ""
+                        print(f"  {i}. {cred.username}{account_info}")
                     
                     while True:
                         try:
@@ -259,44 +1470,100 @@ rive_key(self, password, salt):
                             print("❌ Por favor ingresa un número válido.")
         
         # Mostrar y copiar la credencial seleccionada
-        account_info = f" ({selected_credential['account_name']})" if selected_credential.get('account_name') else ""
-        try:
-            pyperclip.copy(selected_credential['password'])
-            print(f"✅ Credencial encontrada para '{website}'{account_info}:")
-            print(f"   👤 Usuario: {selected_credential['username']}")
-            print(f"   🔑 Contraseña copiada al portapapeles")
-        except:
-            print(f"✅ Credencial encontrada para '{website}'{account_info}:")
-            print(f"   👤 Usuario: {selected_credential['username']}")
-            print(f"   🔑 Contraseña: {selected_credential['password']}")
-            print("   ⚠️  No se pudo copiar al portapapeles")
-    
-    def list_credentials(self):
-        """Lista todos los sitios web almacenados"""
+        account_info = f" ({selected_credential.account_name})" if selected_credential.account_name else ""
+        with self.reveal_password(selected_credential) as password:
+            try:
+                import pyperclip  # Solo 'get' usa el portapapeles
+                pyperclip.copy(password.decode('utf-8'))
+                print(f"✅ Credencial encontrada para '{website}'{account_info}:")
+                print(f"   👤 Usuario: {selected_credential.username}")
+                print(f"   🔑 Contraseña copiada al portapapeles")
+            except:
+                print(f"✅ Credencial encontrada para '{website}'{account_info}:")
+                print(f"   👤 Usuario: {selected_credential.username}")
+                print(f"   🔑 Contraseña: {password.decode('utf-8')}")
+                print("   ⚠️  No se pudo copiar al portapapeles")
+    
+    def iter_credentials(self, prefix=None, sort=None, offset=0, limit=None):
+        """
+        Genera pares (sitio, credencial) de forma perezosa.
+        :param prefix: solo sitios que empiezan por este prefijo.
+        :param sort: None (orden de inserción), 'site' o 'user'.
+        :param offset/limit: paginación; tomar las primeras filas no ordena todo el almacén.
+        """
+        if sort not in (None, 'site', 'user'):
+            raise ValueError(f"Orden no soportado: {sort}")
+        self.refresh()
+        sites = (website for website in self.vault_data if prefix is None or website.startswith(prefix))
+        if sort == 'site':
+            rows = ((website, credential) for website in _lazy_sorted(sites)
+                    for credential in self.vault_data[website])
+        elif sort == 'user':
+            keys = ((credential.username, website, i) for website in sites
+                    for i, credential in enumerate(self.vault_data[website]))
+            rows = ((website, self.vault_data[website][i]) for _, website, i in _lazy_sorted(keys))
+        else:
+            rows = ((website, credential) for website in sites for credential in self.vault_data[website])
+        stop = None if limit is None else offset + limit
+        return itertools.islice(rows, offset, stop)
+    
+    def list_credentials(self, prefix=None, sort=None, offset=0, limit=None, page_size=None, as_json=False):
+        """
+        Lista las credenciales en streaming, con filtro por prefijo de sitio,
+        orden, paginación y salida JSON (una línea por credencial).
+        """
         if not self.vault_data:
-            print("📭 No hay credenciales almacenadas.")
+            if not as_json:
+                print("📭 No hay credenciales almacenadas.")
+            return
+        
+        rows = self.iter_credentials(prefix, sort, offset, limit)
+        if as_json:
+            for website, credential in rows:
+                print(json.dumps({'site': website, 'username': credential.username,
+                                  'account_name': credential.account_name}, ensure_ascii=False))
             return
         
-        total_credentials = sum(len(creds) for creds in self.vault_data.values())
-        print(f"📋 Credenciales almacenadas ({total_credentials} cuentas en {len(self.vault_data)} sitios):")
+        print(f"📋 Credenciales almacenadas ({len(self._identity_index)} cuentas en {len(self.vault_data)} sitios):")
         print("-" * 50)
         
-        for website, credentials in self.vault_data.items():
-            print(f"🌐 {website}")
-            if not credentials:
-                print("   ⚠️  Sin credenciales")
-                continue
-            
-            for i, credential in enumerate(credentials, 1):
-                account_info = f" ({credential['account_name']})" if credential.get('account_name') else ""
-                if len(credentials) > 1:
-                    print(f"   {i}. 👤 {credential['username']}{account_info}")
+        current_site = None
+        shown = 0
+        for website, credential in rows:
+            account_info = f" ({credential.account_name})" if credential.account_name else ""
+            if sort == 'user':
+                print(f"👤 {credential.username}{account_info}  🌐 {website}")
+            else:
+                if website != current_site:
+                    if current_site is not None:
+                        print()
+                    print(f"🌐 {website}")
+                    current_site, position = website, 0
+                position += 1
+                if len(self.vault_data[website]) > 1:
+                    print(f"   {position}. 👤 {credential.username}{account_info}")
                 else:
-                    print(f"   👤 {credential['username']}{account_info}")
-            print()
+                    print(f"   👤 {credential.username}{account_info}")
+            shown += 1
+            if page_size and shown % page_size == 0:
+                if input("-- Enter para continuar, 'q' para terminar -- ").strip().lower() == 'q':
+                    break
+        if shown == 0:
+            print("📭 Ninguna credencial coincide.")
+        print()
+    
+    def list_command(self, prefix=None, sort=None, limit=None, page=None, offset=0, as_json=False):
+        """Comando 'list': traduce --page a desplazamiento y pagina la salida de texto"""
+        if page is not None:
+            if not limit:
+                raise ValueError("--page requiere --limit")
+            offset = (page - 1) * limit
+        page_size = None if as_json else self.list_page_size
+        self.list_credentials(prefix, sort, offset, limit, page_size, as_json)
     
     def delete_credential(self, website, identifier=None):
         """Elimina una credencial del almacén"""
+        self.refresh()
         if website not in self.vault_data:
             print(f"❌ No se encontró credencial para '{website}'.")
             return
@@ -309,15 +1576,14 @@ rive_key(self, password, salt):
         # Si hay una sola credencial
         if len(credentials) == 1:
             credential_to_delete = credentials[0]
-            account_info = f" ({credential_to_delete['account_name']})" if credential_to_delete.get('account_name') else ""
-            print(f"⚠️  ¿Estás seguro de eliminar la credencial '{credential_to_delete['username']}{account_info}' de '{website}'? (s/N): ", end="")
+            account_info = f" ({credential_to_delete.account_name})" if credential_to_delete.account_name else ""
+            print(f"⚠️  ¿Estás seguro de eliminar la credencial '{credential_to_delete.username}{account_info}' de '{website}'? (s/N): ", end="")
             response = input().lower()
             if response != 's':
                 print("Operación cancelada.")
                 return
             
-            del self.vault_data[website]
-            self.save_vault()
+            self.remove_credential(website, credential_to_delete)
             print(f"✅ Credencial eliminada exitosamente.")
             return
         
@@ -325,8 +1591,8 @@ rive_key(self, password, salt):
         if identifier is None:
             print(f"🔍 Múltiples cuentas encontradas para '{website}':")
             for i, cred in enumerate(credentials, 1):
-                account_info = f" ({cred['account_name']})" if cred.get('account_name') else ""
-                print(f"  {i}. {cred['username']}{account_info}")
+                account_info = f" ({cred.account_name})" if cred.account_name else ""
+                print(f"  {i}. {cred.username}{account_info}")
             
             while True:
                 try:
@@ -344,25 +1610,18 @@ rive_key(self, password, salt):
                     print("❌ Por favor ingresa un número válido.")
         else:
             # Buscar por identificador
-            found_credentials = []
-            found_indices = []
-            for i, cred in enumerate(credentials):
-                if (cred['username'] == identifier or 
-                    cred.get('account_name') == identifier):
-                    found_credentials.append(cred)
-                    found_indices.append(i)
+            found_credentials = self.find_credentials(website, identifier)
             
             if not found_credentials:
                 print(f"❌ No se encontró credencial para '{identifier}' en '{website}'.")
                 return
             elif len(found_credentials) == 1:
                 credential_to_delete = found_credentials[0]
-                credential_index = found_indices[0]
             else:
                 print(f"🔍 Múltiples coincidencias encontradas:")
                 for i, cred in enumerate(found_credentials, 1):
-                    account_info = f" ({cred['account_name']})" if cred.get('account_name') else ""
-                    print(f"  {i}. {cred['username']}{account_info}")
+                    account_info = f" ({cred.account_name})" if cred.account_name else ""
+                    print(f"  {i}. {cred.username}{account_info}")
                 
                 while True:
                     try:
@@ -370,7 +1629,6 @@ rive_key(self, password, salt):
                         choice = int(choice)
                         if 1 <= choice <= len(found_credentials):
                             credential_to_delete = found_credentials[choice - 1]
-                            credential_index = found_indices[choice - 1]
                             break
                         else:
                             print(f"❌ Número inválido. Debe estar entre 1 y {len(found_credentials)}.")
@@ -378,43 +1636,306 @@ rive_key(self, password, salt):
                         print("❌ Por favor ingresa un número válido.")
         
         # Confirmar eliminación
-        account_info = f" ({credential_to_delete['account_name']})" if credential_to_delete.get('account_name') else ""
-        print(f"⚠️  ¿Estás seguro de eliminar la credencial '{credential_to_delete['username']}{account_info}' de '{website}'? (s/N): ", end="")
+        account_info = f" ({credential_to_delete.account_name})" if credential_to_delete.account_name else ""
+        print(f"⚠️  ¿Estás seguro de eliminar la credencial '{credential_to_delete.username}{account_info}' de '{website}'? (s/N): ", end="")
         response = input().lower()
         if response != 's':
             print("Operación cancelada.")
             return
         
         # Eliminar credencial
-        if len(credentials) == 1:
-            del self.vault_data[website]
+        self.remove_credential(website, credential_to_delete)
+        print(f"✅ Credencial eliminada exitosamente.")
+    
+    def import_credentials(self, rows, overwrite=False):
+        """
+        Importa filas con una única escritura del almacén, consumiéndolas de una
+        en una. Deduplica por identidad (sitio, usuario, cuenta) contra el almacén
+        y dentro de las propias filas: sin overwrite se conserva la credencial
+        existente y con overwrite gana la última fila.
+        :param rows: pares (número de línea, Row o motivo del error), como los
+                     de cerbero_transfer.read_rows().
+        Devuelve un Counter (added, updated, unchanged, duplicate, invalid) y la
+        lista de (línea, motivo) de las filas no válidas.
+        """
+        counts = collections.Counter()
+        errors = []
+        seal = self.password_sealer()
+        self.refresh()
+        self._batch_depth += 1
+        try:
+            for line_number, row in rows:
+                if isinstance(row, str):
+                    counts['invalid'] += 1
+                    errors.append((line_number, row))
+                    continue
+                existing = self._find_credential(row.site, row.username, row.account_name)
+                if existing is None:
+                    credential = Credential(row.username, seal(row.password), row.account_name)
+                    self._insert_credential(row.site, credential)
+                    self._record_put(row.site, credential)
+                    counts['added'] += 1
+                    continue
+                if not overwrite:
+                    counts['duplicate'] += 1
+                    continue
+                with self.reveal_password(existing) as current:
+                    unchanged = hmac.compare_digest(current, row.password.encode('utf-8'))
+                if unchanged:
+                    counts['unchanged'] += 1
+                    continue
+                existing.secret = seal(row.password)
+                self._record_put(row.site, existing)
+                counts['updated'] += 1
+        finally:
+            # Lo importado se guarda aunque la lectura falle a medias: repetir
+            # la importación es seguro porque se deduplica por identidad
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                if counts['added'] + counts['updated'] >= self.compaction_min_records:
+                    # Importación grande: una instantánea en lugar de un registro
+                    # de journal enorme que se reaplicaría en cada carga
+                    self.compact_vault()
+                else:
+                    self.save_vault()
+                    self.flush()
+        return counts, errors
+    
+    def export_rows(self, prefix=None):
+        """Genera las credenciales ordenadas por sitio como filas en claro, descifrando una cada vez"""
+        Row = _transfer().Row
+        for website, credential in self.iter_credentials(prefix, sort='site'):
+            with self.reveal_password(credential) as password:
+                plain = password.decode('utf-8')
+            yield Row(website, credential.username, plain, credential.account_name)
+    
+    def export_credentials(self, stream, fmt='csv', prefix=None, password=None):
+        """
+        Escribe las credenciales en `stream` en streaming. Con `password` se cifran
+        por bloques (Fernet con una clave derivada de esa contraseña, sal nueva y
+        los parámetros del KDF del almacén); si no, van en claro en CSV, JSONL o
+        CSV de Chrome. Devuelve el número de filas.
+        """
+        transfer = _transfer()
+        rows = self.export_rows(prefix)
+        if password is None:
+            return transfer.write_rows(rows, stream, fmt)
+        kdf = dict(self.vault_kdf or self.default_kdf(), salt=self.generate_salt())
+        fernet = _crypto().Fernet(self.derive_key(password, kdf['salt'], kdf))
+        return transfer.write_encrypted(rows, stream, {'kdf': self._kdf_to_header(kdf)}, fernet.encrypt)
+    
+    def _export_decryptor(self, header):
+        """Pide la contraseña de una exportación cifrada y devuelve su función de descifrado"""
+        password = getpass.getpass("🔐 Contraseña de la exportación: ")
+        kdf = dict(header['kdf'], salt=base64.b64decode(header['kdf']['salt']))
+        fernet = _crypto().Fernet(self.derive_key(password, kdf['salt'], kdf))
+        
+        def decrypt(token):
+            try:
+                return fernet.decrypt(token)
+            except Exception:
+                raise ValueError("Error al descifrar la exportación: contraseña incorrecta o archivo dañado") from None
+        
+        return decrypt
+    
+    def import_file(self, path, overwrite=False):
+        """Comando 'import': importa un archivo (el formato se detecta) y muestra el resumen"""
+        start = time.perf_counter()
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as stream:
+                rows = _transfer().read_rows(stream, self._export_decryptor)
+                counts, errors = self.import_credentials(rows, overwrite)
+        except OSError as e:
+            print(f"❌ No se pudo abrir el archivo: {e}")
+            return None
+        except ValueError as e:
+            print(f"❌ {e}")
+            print("   Lo leído hasta el error ya está guardado; puedes repetir la importación sin duplicar nada.")
+            return None
+        elapsed = time.perf_counter() - start
+        print(f"✅ Importación completada en {elapsed:.2f} s: {counts['added']} nueva(s), "
+              f"{counts['updated']} actualizada(s), {counts['unchanged']} sin cambios, "
+              f"{counts['duplicate']} ya existía(n), {counts['invalid']} no válida(s).")
+        if counts['duplicate']:
+            print("   Las que ya existían no se tocaron (usa --overwrite para actualizarlas).")
+        for line_number, reason in errors[:10]:
+            print(f"   ⚠️  Línea {line_number}: {reason}")
+        if len(errors) > 10:
+            print(f"   ... y {len(errors) - 10} más")
+        return counts
+    
+    def export_file(self, path, prefix=None, fmt=None, encrypt=False):
+        """Comando 'export': escribe el archivo de forma atómica y con permisos 0600"""
+        if encrypt and fmt:
+            print("❌ --encrypt usa su propio formato; no se puede combinar con --format.")
+            return None
+        if os.path.exists(path):
+            print(f"⚠️  El archivo '{path}' ya existe. ¿Deseas sobrescribirlo? (s/N): ", end="")
+            response = input().lower()
+            if response != 's':
+                print("Operación cancelada.")
+                return None
+        password = None
+        if encrypt:
+            password = getpass.getpass("🔐 Crea una contraseña para la exportación: ")
+            if len(password) < 8:
+                print("❌ La contraseña debe tener al menos 8 caracteres.")
+                return None
+            if getpass.getpass("🔐 Confirma la contraseña: ") != password:
+                print("❌ Las contraseñas no coinciden.")
+                return None
         else:
-            credentials.remove(credential_to_delete)
+            print("⚠️  El archivo contendrá las contraseñas en claro (usa --encrypt para cifrarlo).")
         
-        self.save_vault()
-        print(f"✅ Credencial eliminada exitosamente.")
+        start = time.perf_counter()
+        tmp_path = path + '.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with open(fd, 'w', encoding='utf-8', newline='') as stream:
+                count = self.export_credentials(stream, fmt or 'csv', prefix, password)
+                stream.flush()
+                os.fsync(stream.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+        kind = "cifrada" if encrypt else fmt or 'csv'
+        print(f"✅ {count} credencial(es) exportada(s) a '{path}' ({kind}, {time.perf_counter() - start:.2f} s).")
+        return count
+    
+    def execute_batch_command(self, line):
+        """Ejecuta un comando de lote (texto o JSON) y devuelve un resultado estructurado"""
+        if line.startswith('{'):
+            request = json.loads(line)
+            cmd = request.get('cmd', '').lower()
+        else:
+            # Mismas reglas de comillas que el modo interactivo
+            try:
+                parts = shlex.split(line)
+            except ValueError:
+                return {'ok': False, 'error': 'Comillas sin cerrar'}
+            cmd = parts[0].lower()
+            fields = {
+                'add': ['site', 'username', 'password', 'account_name'],
+                'get': ['site', 'identifier'],
+                'delete': ['site', 'identifier'],
+                'search': ['query', 'limit'],
+                'list': ['prefix', 'limit', 'offset'],
+            }.get(cmd, [])
+            if len(parts) - 1 > len(fields):
+                return {'cmd': cmd, 'ok': False, 'error': 'Demasiados argumentos'}
+            request = dict(zip(fields, parts[1:]))
+        return self.execute_request(cmd, request)
+    
+    def execute_request(self, cmd, request):
+        """Ejecuta un comando ya decodificado (modo lote y servicio) y devuelve su resultado"""
+        if cmd == 'add':
+            missing = [f for f in ('site', 'username', 'password') if not request.get(f)]
+            if missing:
+                return {'cmd': cmd, 'ok': False, 'error': f"Faltan campos: {', '.join(missing)}"}
+            status = self.store_credential(request['site'], request['username'], request['password'],
+                                           request.get('account_name'), bool(request.get('overwrite')))
+            return {'cmd': cmd, 'ok': status != 'exists', 'site': request['site'], 'status': status}
+        if cmd in ('get', 'delete'):
+            if not request.get('site'):
+                return {'cmd': cmd, 'ok': False, 'error': 'Falta el campo: site'}
+            website = request['site']
+            matches = self.find_credentials(website, request.get('identifier'))
+            if not matches:
+                return {'cmd': cmd, 'ok': False, 'site': website, 'error': 'not_found'}
+            if len(matches) > 1:
+                candidates = [{'username': c.username, 'account_name': c.account_name} for c in matches]
+                return {'cmd': cmd, 'ok': False, 'site': website, 'error': 'ambiguous', 'candidates': candidates}
+            credential = matches[0]
+            result = {'cmd': cmd, 'ok': True, 'site': website, 'username': credential.username,
+                      'account_name': credential.account_name}
+            if cmd == 'get':
+                with self.reveal_password(credential) as password:
+                    result['password'] = password.decode('utf-8')
+            else:
+                self.remove_credential(website, credential)
+            return result
+        if cmd == 'search':
+            if not request.get('query'):
+                return {'cmd': cmd, 'ok': False, 'error': 'Falta el campo: query'}
+            matches = [{'site': website, 'username': c.username, 'account_name': c.account_name,
+                        'score': value}
+                       for value, website, c in self.search(request['query'], int(request.get('limit', 20)))]
+            return {'cmd': cmd, 'ok': True, 'results': matches}
+        if cmd == 'list':
+            offset = int(request.get('offset', 0))
+            limit = int(request['limit']) if request.get('limit') is not None else None
+            rows = [{'site': website, 'username': c.username, 'account_name': c.account_name}
+                    for website, c in self.iter_credentials(request.get('prefix'), request.get('sort'),
+                                                            offset, limit)]
+            result = {'cmd': cmd, 'ok': True, 'rows': rows}
+            if limit is not None and len(rows) == limit:
+                result['next_offset'] = offset + limit
+            return result
+        return {'cmd': cmd, 'ok': False, 'error': f"Comando desconocido: {cmd}"}
+    
+    def run_batch_mode(self, stream, output=None):
+        """
+        Ejecuta comandos de lote (uno por línea, texto o JSON) con una única
+        escritura del almacén al final. Escribe un resultado JSON por línea.
+        Devuelve el número de comandos fallidos. Cualquier otro mensaje va a
+        stderr para que la salida solo contenga JSON.
+        """
+        output = output or sys.stdout
+        failures = 0
+        with contextlib.redirect_stdout(sys.stderr), self.batch():
+            for line_number, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                try:
+                    result = self.execute_batch_command(line)
+                except Exception as e:
+                    result = {'ok': False, 'error': str(e)}
+                result['line'] = line_number
+                failures += not result['ok']
+                output.write(json.dumps(result, ensure_ascii=False) + '\n')
+        output.flush()
+        return failures
     
     def show_help(self):
-        """Muestra la ayuda del sistema"""
+        """Muestra la ayuda del sistema (generada a partir del registro de comandos)"""
         print("\n🔐 Sistema de Gestión de Contraseñas")
         print("=" * 50)
         print("Comandos disponibles:")
-        print("  setup                              - Configuración inicial")
-        print("  add <sitio> <usuario> <contraseña> [nombre_cuenta] - Añadir credencial")
-        print("  get <sitio> [usuario_o_cuenta]     - Obtener credencial")
-        print("  list                               - Listar todos los sitios")
-        print("  delete <sitio> [usuario_o_cuenta]  - Eliminar credencial")
-        print("  help                               - Mostrar esta ayuda")
-        print("  exit                               - Salir del programa")
+        for name, command in COMMANDS.items():
+            usage = f"{name} {command.usage}".rstrip()
+            if len(usage) >= 35:
+                print(f"  {usage}")
+                usage = ''
+            print(f"  {usage:<35}- {command.help}")
+        print(f"  {'batch [archivo]':<35}- (CLI) Ejecutar comandos en lote desde archivo o stdin")
+        print(f"  {'--version':<35}- (CLI) Mostrar la versión")
+        print()
+        print("Los argumentos con espacios o caracteres especiales van entre comillas, como en la shell.")
         print()
         print("💡 Ejemplos:")
         print("  add gmail juan@work.com pass123 trabajo")
         print("  add gmail juan@personal.com pass456 personal")
         print("  get gmail trabajo")
         print("  get gmail juan@work.com")
+        print("  add 'mi banco' ana 'frase con espacios'")
+        print("  search gmai")
         print("  delete gmail personal")
         print()
     
+    def run_command(self, name, args):
+        """Ejecuta un comando del registro con sus argumentos ya separados"""
+        command = COMMANDS[name]
+        try:
+            values, options = _parse_command_args(command, args)
+        except ValueError as e:
+            print(f"❌ {e}")
+            print(f"❌ Uso: {name} {command.usage}".rstrip())
+            return
+        getattr(self, command.method)(*values, **options)
+    
     def run_interactive_mode(self):
         """Ejecuta el modo interactivo del gestor"""
         print("🔐 Sistema de Gestión de Contraseñas")
@@ -423,45 +1944,24 @@ rive_key(self, password, salt):
         
         while True:
             try:
-                command = input("🔒 password-manager> ").strip().split()
-                if not command:
+                line = input("🔒 password-manager> ")
+                try:
+                    tokens = shlex.split(line)
+                except ValueError:
+                    print("❌ Comillas sin cerrar.")
+                    continue
+                if not tokens:
                     continue
                 
-                cmd = command[0].lower()
-                
-                if cmd == 'exit':
+                name = tokens[0].lower()
+                if name == 'exit':
                     print("👋 ¡Hasta luego!")
                     break
-                elif cmd == 'help':
-                    self.show_help()
-                elif cmd == 'setup':
-                    self.setup_initial_configuration()
-                elif cmd == 'add':
-                    if len(command) < 4 or len(command) > 5:
-                        print("❌ Uso: add <sitio> <usuario> <contraseña> [nombre_cuenta]")
-                        continue
-                    website, username, password = command[1], command[2], command[3]
-                    account_name = command[4] if len(command) == 5 else None
-                    self.add_credential(website, username, password, account_name)
-                elif cmd == 'get':
-                    if len(command) < 2 or len(command) > 3:
-                        print("❌ Uso: get <sitio> [usuario_o_cuenta]")
-                        continue
-                    website = command[1]
-                    identifier = command[2] if len(command) == 3 else None
-                    self.get_credential(website, identifier)
-                elif cmd == 'list':
-                    self.list_credentials()
-                elif cmd == 'delete':
-                    if len(command) < 2 or len(command) > 3:
-                        print("❌ Uso: delete <sitio> [usuario_o_cuenta]")
-                        continue
-                    website = command[1]
-                    identifier = command[2] if len(command) == 3 else None
-                    self.delete_credential(website, identifier)
-                else:
-                    print(f"❌ Comando desconocido: {cmd}")
+                if name not in COMMANDS:
+                    print(f"❌ Comando desconocido: {name}")
                     print("Escribe 'help' para ver los comandos disponibles.")
+                    continue
+                self.run_command(name, tokens[1:])
                 
             except KeyboardInterrupt:
                 print("\n👋 ¡Hasta luego!")
@@ -475,15 +1975,38 @@ def main():
     
     # Verificar argumentos de línea de comandos
     if len(sys.argv) > 1:
-        if sys.argv[1] == 'setup':
-            manager.setup_initial_configuration()
+        name = sys.argv[1]
+        if name in ('--version', '-V'):
+            print(f"Cerbero {__version__}")
             return
-        elif sys.argv[1] == 'help':
-            manager.show_help()
+        if name == 'batch':
+            # Los mensajes van a stderr para que stdout solo contenga JSON
+            with contextlib.redirect_stdout(sys.stderr):
+                unlocked = manager.unlock_vault()
+            if not unlocked:
+                sys.exit(2)
+            source = sys.argv[2] if len(sys.argv) > 2 else '-'
+            stream = sys.stdin if source == '-' else open(source, encoding='utf-8')
+            try:
+                failures = manager.run_batch_mode(stream)
+            finally:
+                if stream is not sys.stdin:
+                    stream.close()
+                manager.close()
+            sys.exit(1 if failures else 0)
+        if name in COMMANDS and name != 'exit':
+            # Comando suelto: se ejecuta y termina (sin pausas de paginación)
+            if COMMANDS[name].needs_vault and not manager.unlock_vault():
+                sys.exit(2)
+            manager.list_page_size = 0
+            try:
+                manager.run_command(name, sys.argv[2:])
+            finally:
+                manager.close()
             return
     
     # Verificar si el sistema está configurado
-    if not os.path.exists(manager.vault_file) or not os.path.exists(manager.salt_file):
+    if not manager.is_configured():
         print("🔧 Sistema no configurado. Ejecutando configuración inicial...")
         if not manager.setup_initial_configuration():
             return
@@ -494,7 +2017,10 @@ def main():
         return
     
     # Ejecutar modo interactivo
-    manager.run_interactive_mode()
+    try:
+        manager.run_interactive_mode()
+    finally:
+        manager.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,92 @@
+# Mide el coste de importar helado_dequeso y el coste por llamada de sus métodos.
+# Comprueba además que summarize da cuantiles exactos con pocos valores.
+# Uso: python benchmark_helado_dequeso.py
+
+import os
+import sys
+import timeit
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ('numpy', 'pandas', 'matplotlib')
+
+IMPORT_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import helado_dequeso
+elapsed = time.perf_counter() - start
+loaded = [m for m in {heavy!r} if m in sys.modules]
+print(elapsed, ','.join(loaded))
+"""
+
+
+def measure_import(repeats: int = 5):
+    """Tiempo de importación en un intérprete limpio (mejor de `repeats`)"""
+    best, loaded = float('inf'), ''
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_SNIPPET.format(heavy=HEAVY_MODULES)],
+            cwd=HERE, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        best = min(best, float(output[0]))
+        loaded = output[1] if len(output) > 1 else ''
+    return best, loaded
+
+
+def per_call_ns(statement: str, setup: str, number: int = 200000) -> float:
+    """Coste medio por llamada en nanosegundos (mejor de 5 repeticiones)"""
+    timer = timeit.Timer(statement, setup=setup, globals={})
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e9
+
+
+def check_summaries():
+    """
+    Con menos valores que sample_size los cuantiles de summarize son exactos.
+    Lanza RuntimeError si no (no usa assert: python -O lo eliminaría).
+    """
+    import numpy as np
+    from helado_dequeso import summarize
+    quantiles = (0.01, 0.5, 0.99)
+    for values in ([1, 2, 3], np.arange(100.0), np.array([5.0, np.nan, -1.0, np.inf, 2.0])):
+        finite = np.asarray(values, dtype=float)
+        finite = finite[np.isfinite(finite)]
+        expected = np.quantile(finite, quantiles).tolist()
+        got = list(summarize(values, quantiles=quantiles)['quantiles'].values())
+        if not np.allclose(got, expected):
+            raise RuntimeError(f"summarize({values!r}): cuantiles {got}, se esperaban {expected}")
+
+
+def main():
+    sys.path.insert(0, HERE)
+    check_summaries()
+    print("[COMPROBACIONES]")
+    print("  summarize: cuantiles exactos en arrays pequeños")
+    elapsed, loaded = measure_import()
+    print("[IMPORT]")
+    print(f"  import helado_dequeso: {elapsed * 1000:.2f} ms")
+    print(f"  Módulos pesados cargados: {loaded or 'ninguno'}")
+
+    setup = "from helado_dequeso import HeladoDeQueso; off = HeladoDeQueso(active=False)"
+    cases = [
+        ("llamada vacía (referencia)", "f()", "f = lambda *a, **k: None"),
+        ("off.log(msg)", "off.log('paso', title='TRAIN')", setup),
+        ("off.describe(x, 'x')", "off.describe(x, 'x')", setup + "; x = [1, 2, 3]"),
+        ("off and off.describe(...)", "off and off.describe(x, 'x')", setup + "; x = [1, 2, 3]"),
+        ("with off.timer(name)", "with off.timer('paso'): pass", setup),
+        ("with on.timer(name)", "with on.timer('paso'): pass",
+         "from helado_dequeso import HeladoDeQueso; on = HeladoDeQueso()"),
+    ]
+    print("\n[POR LLAMADA]")
+    for label, statement, case_setup in cases:
+        print(f"  {label:<28} {per_call_ns(statement, case_setup):8.1f} ns")
+
+    # Logging activo hacia un buffer en memoria: síncrono frente a cola + hilo de fondo
+    sink_setup = "import io; from helado_dequeso import HeladoDeQueso, StdoutSink; "
+    for label, options in (("on.log(msg) síncrono", "async_log=False"), ("on.log(msg) asíncrono", "async_log=True")):
+        on_setup = sink_setup + f"on = HeladoDeQueso({options}, sinks=[StdoutSink(io.StringIO())])"
+        active_ns = per_call_ns("on.log('paso', title='TRAIN')", on_setup, number=20000)
+        print(f"  {label:<28} {active_ns:8.1f} ns")
+
+
+if __name__ == "__main__":
+    main()
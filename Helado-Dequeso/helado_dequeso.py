@@ -1,103 +1,1548 @@
 # NOTA: Este toolkit requiere numpy, pandas, matplotlib, y opcionalmente torch y tensorflow.
 # Instala los paquetes necesarios con:
 # pip install numpy pandas matplotlib torch tensorflow
+#
+# Las dependencias pesadas se importan de forma diferida: importar este módulo
+# no carga numpy, pandas ni matplotlib hasta que un método los necesita.
 
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
+import os
 import sys
-from typing import Any, Optional, List, Union
+import json
+import time
+import zlib
+import struct
+import atexit
+import functools
+import contextlib
+import threading
+import tracemalloc
+from collections import Counter, deque
+from typing import Any, Optional, List, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+def _np():
+    """Importa numpy bajo demanda"""
+    import numpy
+    return numpy
+
+
+def _plt():
+    """Importa matplotlib.pyplot bajo demanda"""
+    import matplotlib.pyplot
+    return matplotlib.pyplot
+
+
+def _is_ndarray(value: Any) -> bool:
+    """isinstance(value, np.ndarray) sin importar numpy si nadie lo ha hecho"""
+    numpy = sys.modules.get('numpy')
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+def _is_torch(value: Any) -> bool:
+    """isinstance(value, torch.Tensor) sin importar torch si nadie lo ha hecho"""
+    torch = sys.modules.get('torch')
+    return torch is not None and isinstance(value, torch.Tensor)
+
+
+def _host_array(value: Any) -> "np.ndarray":
+    """Convierte tensores (PyTorch/TensorFlow), listas o arrays en un array de numpy en el host"""
+    if _is_torch(value):
+        value = value.detach().cpu().numpy()
+    elif hasattr(value, 'numpy') and not _is_ndarray(value):
+        value = value.numpy()
+    return _np().asarray(value)
+
+
+def _to_host(chunk: Any) -> "np.ndarray":
+    """Convierte un trozo (numpy, memmap, tensor de TF, lista...) en un array de numpy plano"""
+    return _host_array(chunk).reshape(-1)
+
+
+def _head(variable: Any, n: int) -> "np.ndarray":
+    """Primeros n elementos en orden plano, copiando al host solo las filas necesarias"""
+    shape = tuple(variable.shape)
+    if len(shape) == 0:
+        return _to_host(variable)
+    row_size = 1
+    for dim in shape[1:]:
+        row_size *= int(dim)
+    rows = -(-n // max(1, row_size))
+    block = variable[:rows]
+    if _is_torch(block):
+        return block.detach().reshape(-1)[:n].cpu().numpy()
+    return _to_host(block)[:n]
+
+
+def _iter_chunks(variable: Any, chunk_size: int):
+    """Recorre un array por bloques del primer eje de unos chunk_size elementos.
+    Sirve para memmaps, datasets de h5py/zarr o tensores sin cargarlos enteros."""
+    shape = tuple(variable.shape)
+    if len(shape) == 0:
+        yield variable
+        return
+    row_size = 1
+    for dim in shape[1:]:
+        row_size *= int(dim)
+    rows = max(1, chunk_size // max(1, row_size))
+    for start in range(0, int(shape[0]), rows):
+        yield variable[start:start + rows]
+
+
+def _chunk_stats(chunk: Any, stride: int, rng) -> tuple:
+    """
+    Estadísticas de un trozo en una pasada vectorizada:
+    (n finitos, NaN, Inf, ceros, total, min, max, media, M2, muestra sin reemplazo de ~n/stride valores).
+    Con stride=0 no se toma muestra (devuelve None).
+    Los tensores de PyTorch se reducen en su dispositivo y solo viajan escalares y la muestra.
+    """
+    if _is_torch(chunk):
+        torch = sys.modules['torch']
+        flat = chunk.detach().reshape(-1)
+        if flat.is_complex():
+            raise TypeError("tipo complejo")
+        if flat.is_floating_point():
+            nan = torch.isnan(flat).sum()
+            inf = torch.isinf(flat).sum()
+            finite = flat[torch.isfinite(flat)].double()
+        else:
+            nan = inf = torch.zeros((), dtype=torch.int64, device=flat.device)
+            finite = flat.double()
+        zeros = (flat == 0).sum()
+        count = finite.numel()
+        if count:
+            mean = finite.mean()
+            scalars = torch.stack([nan.double(), inf.double(), zeros.double(), finite.min(), finite.max(),
+                                   mean, ((finite - mean) ** 2).sum()]).tolist()
+        else:
+            scalars = torch.stack([nan.double(), inf.double(), zeros.double()]).tolist() + [0.0] * 4
+        sample = None
+        if stride:
+            wanted = -(-count // stride)
+            if wanted < count:
+                finite = finite[torch.randperm(count, device=finite.device)[:wanted]]
+            sample = finite.cpu().numpy()
+    else:
+        np = _np()
+        flat = _to_host(chunk)
+        if flat.dtype.kind not in 'biuf':
+            raise TypeError(f"tipo no numérico ({flat.dtype})")
+        if flat.dtype.kind == 'f':
+            nan_mask = np.isnan(flat)
+            inf_mask = np.isinf(flat)
+            finite = flat[~(nan_mask | inf_mask)].astype(np.float64)
+            nan, inf = int(nan_mask.sum()), int(inf_mask.sum())
+        else:
+            finite = flat.astype(np.float64)
+            nan = inf = 0
+        count = finite.size
+        mean = float(finite.mean()) if count else 0.0
+        scalars = [nan, inf, int(np.count_nonzero(flat == 0)),
+                   float(finite.min()) if count else 0.0, float(finite.max()) if count else 0.0,
+                   mean, float(((finite - mean) ** 2).sum()) if count else 0.0]
+        # Muestra aleatoria sin reemplazo (no a saltos fijos, que se alinean con
+        # patrones periódicos); si caben todos, se usan todos y los cuantiles son exactos
+        sample = None
+        if stride:
+            wanted = -(-count // stride)
+            sample = finite[rng.choice(count, wanted, replace=False)] if wanted < count else finite
+    nan, inf, zeros, low, high, mean, m2 = scalars
+    return count, int(nan), int(inf), int(zeros), int(flat.numel() if _is_torch(flat) else flat.size), \
+        low, high, mean, m2, sample
+
+
+def _merge_moments(count, mean, m2, other_count, other_mean, other_m2):
+    """Combina (n, media, M2) de dos grupos (Welford por bloques, Chan et al.)"""
+    merged = count + other_count
+    if not merged:
+        return 0, 0.0, 0.0
+    delta = other_mean - mean
+    return (merged, mean + delta * other_count / merged,
+            m2 + other_m2 + delta * delta * count * other_count / merged)
+
+
+def summarize(variable: Any, quantiles=(0.01, 0.5, 0.99), chunk_size: int = 1 << 22,
+              sample_size: int = 10000) -> dict:
+    """
+    Resumen estadístico de un array o tensor numérico recorriéndolo por bloques.
+    :param variable: Array de numpy/memmap, tensor de PyTorch/TensorFlow, dataset troceable o lista.
+    :param quantiles: Cuantiles aproximados a estimar sobre una muestra de sample_size valores.
+    :param chunk_size: Elementos por bloque; acota la memoria usada con arrays mayores que la RAM.
+    :return: dict con count, nan, inf, zeros, sparsity, min, max, mean, std y quantiles.
+    """
+    if not hasattr(variable, 'shape'):
+        variable = _np().asarray(variable)
+    total = 1
+    for dim in variable.shape:
+        total *= int(dim)
+    stride = max(1, total // max(1, sample_size))
+    count = nan = inf = zeros = size = 0
+    low, high, mean, m2 = float('inf'), float('-inf'), 0.0, 0.0
+    samples = []
+    rng = _np().random.default_rng(0)
+    for chunk in _iter_chunks(variable, chunk_size):
+        c_count, c_nan, c_inf, c_zeros, c_size, c_low, c_high, c_mean, c_m2, sample = _chunk_stats(chunk, stride, rng)
+        nan, inf, zeros, size = nan + c_nan, inf + c_inf, zeros + c_zeros, size + c_size
+        samples.append(sample)
+        if not c_count:
+            continue
+        count, mean, m2 = _merge_moments(count, mean, m2, c_count, c_mean, c_m2)
+        low, high = min(low, c_low), max(high, c_high)
+    np = _np()
+    sample = np.concatenate(samples) if samples else np.empty(0)
+    return {
+        'count': count, 'nan': nan, 'inf': inf, 'zeros': zeros,
+        'sparsity': zeros / size if size else 0.0,
+        'min': low if count else None, 'max': high if count else None,
+        'mean': mean if count else None, 'std': (m2 / count) ** 0.5 if count else None,
+        'quantiles': dict(zip(quantiles, np.quantile(sample, quantiles).tolist())) if sample.size else {},
+    }
+
+
+def _to_uint8(array: "np.ndarray") -> "np.ndarray":
+    """Escala un lote a uint8: floats en [0, 1] se multiplican por 255; el resto se normaliza por min/max"""
+    np = _np()
+    if array.dtype == np.uint8:
+        return array
+    array = array.astype(np.float32, copy=False)
+    low, high = float(np.nanmin(array)), float(np.nanmax(array))
+    if low >= 0.0 and high <= 1.0:
+        scaled = array * 255.0
+    elif high > low:
+        scaled = (array - low) * (255.0 / (high - low))
+    else:
+        scaled = np.zeros_like(array)
+    return np.nan_to_num(scaled, copy=False).clip(0, 255).astype(np.uint8)
+
+
+def make_mosaic(images: Any, ncols: Optional[int] = None, max_images: Optional[int] = None,
+                max_side: Optional[int] = None, pad: int = 1) -> "np.ndarray":
+    """
+    Une un lote de imágenes en un único array (mosaico) con operaciones vectorizadas de NumPy.
+    :param images: Array o tensor (N, H, W), (N, H, W, C) o (N, C, H, W), o lista de imágenes iguales.
+    :param ncols: Columnas del mosaico (por defecto, lo más cuadrado posible).
+    :param max_images: Si el lote es mayor, se toman max_images imágenes equiespaciadas.
+    :param max_side: Reduce cada imagen (promedio por bloques) hasta que su lado mayor no lo supere.
+    :param pad: Píxeles de separación entre imágenes.
+    :return: Array uint8 (alto, ancho) o (alto, ancho, C).
+    """
+    np = _np()
+    n_images = len(images)
+    index = None
+    if max_images is not None and n_images > max_images:
+        index = np.linspace(0, n_images - 1, max_images).astype(np.int64)
+        n_images = max_images
+    if isinstance(images, (list, tuple)):
+        # Se copia cada imagen directamente a su hueco, sin np.array(lista) intermedio
+        chosen = [images[i] for i in index] if index is not None else images
+        first = _host_array(chosen[0])
+        batch = np.empty((n_images,) + first.shape, dtype=first.dtype)
+        for i, image in enumerate(chosen):
+            batch[i] = _host_array(image)
+    else:
+        if index is not None and _is_torch(images):
+            batch = _host_array(images[sys.modules['torch'].from_numpy(index)])
+        elif index is not None:
+            batch = _host_array(images)[index]
+        else:
+            batch = _host_array(images)
+    if batch.ndim == 3:
+        batch = batch[..., None]
+    elif batch.ndim == 4 and batch.shape[1] in (1, 3, 4) and batch.shape[-1] not in (1, 3, 4):
+        batch = batch.transpose(0, 2, 3, 1)  # (N, C, H, W) -> (N, H, W, C)
+    if batch.ndim != 4:
+        raise ValueError(f"se esperaban imágenes (N, H, W[, C]) y llegó la forma {batch.shape}")
+    n, height, width, channels = batch.shape
+    if max_side is not None and max(height, width) > max_side:
+        factor = -(-max(height, width) // max_side)
+        height, width = height // factor, width // factor
+        blocks = batch[:, :height * factor, :width * factor].reshape(
+            n, height, factor, width, factor, channels).mean(axis=(2, 4))
+        # Los enteros vuelven a su tipo: así _to_uint8 ve el mismo rango que sin max_side
+        if np.issubdtype(batch.dtype, np.integer):
+            blocks = np.rint(blocks).astype(batch.dtype)
+        batch = blocks
+    batch = _to_uint8(batch)
+    ncols = min(ncols or int(np.ceil(np.sqrt(n))), n)
+    nrows = -(-n // ncols)
+    tiles = np.zeros((nrows * ncols, height + pad, width + pad, channels), dtype=np.uint8)
+    tiles[:n, :height, :width] = batch
+    mosaic = tiles.reshape(nrows, ncols, height + pad, width + pad, channels).transpose(0, 2, 1, 3, 4)
+    mosaic = mosaic.reshape(nrows * (height + pad), ncols * (width + pad), channels)
+    mosaic = mosaic[:mosaic.shape[0] - pad or None, :mosaic.shape[1] - pad or None]
+    return mosaic[..., 0] if channels == 1 else mosaic
+
+
+def encode_png(image: "np.ndarray", compress_level: int = 1) -> bytes:
+    """
+    Codifica un array uint8 (H, W), (H, W, 3) o (H, W, 4) como PNG sin usar matplotlib.
+    :param image: Imagen en escala de grises, RGB o RGBA.
+    :param compress_level: Nivel de zlib (1 prioriza velocidad).
+    :return: Bytes del fichero PNG.
+    """
+    np = _np()
+    image = _to_uint8(_np().asarray(image))
+    if image.ndim == 3 and image.shape[2] == 1:
+        image = image[..., 0]
+    height, width = image.shape[:2]
+    color_type = {2: 0, 3: {3: 2, 4: 6}.get(image.shape[-1])}.get(image.ndim)
+    if color_type is None:
+        raise ValueError(f"forma no soportada para PNG: {image.shape}")
+    # Cada fila empieza con el byte de filtro 0 (sin filtro)
+    rows = np.zeros((height, 1 + image[0].size), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, -1)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(rows.tobytes(), compress_level)) + chunk(b'IEND', b''))
+
+
+def _write_png(image: "np.ndarray", path: Any) -> bytes:
+    """Escribe el PNG en una ruta o en un objeto con write(); devuelve los bytes"""
+    data = encode_png(image)
+    if hasattr(path, 'write'):
+        path.write(data)
+    elif path is not None:
+        with open(path, 'wb') as f:
+            f.write(data)
+    return data
+
+
+def _render_job(kind: str, shm_name: str, shape: tuple, dtype: str, path: str, options: dict) -> str:
+    """Trabajo de RenderPool: lee el array de memoria compartida y escribe el PNG"""
+    from multiprocessing import shared_memory
+    np = _np()
+    # El segmento lo crea y lo libera el proceso principal; aquí solo se adjunta
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if kind == 'grid':
+            _write_png(make_mosaic(array, **options), path)
+        elif kind == 'heatmap':
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+            plt.imsave(path, array.reshape(array.shape[0], -1), cmap=options.get('cmap', 'viridis'))
+        else:
+            _write_png(array, path)
+        del array
+    finally:
+        shm.close()
+    return path
+
+
+class RenderPool:
+    """
+    Renderiza figuras en un pool de procesos para no bloquear el bucle de entrenamiento.
+    Los arrays viajan por memoria compartida (no se serializan con pickle) y los PNG se
+    escriben en output_dir. Si hay demasiados trabajos pendientes, el nuevo se descarta.
+    :param output_dir: Directorio donde se escriben las figuras.
+    :param workers: Número de procesos de render.
+    :param max_pending: Trabajos en curso a partir de los cuales se descartan fotogramas.
+    """
+    def __init__(self, output_dir: str, workers: int = 2, max_pending: int = 4):
+        self.output_dir = output_dir
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rendered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self._executor = None
+        self._pending = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _start(self):
+        """Devuelve el pool, creándolo la primera vez (bajo el bloqueo: nunca dos pools)"""
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        with self._lock:
+            if self._executor is None:
+                # spawn: no hereda el estado del proceso de entrenamiento (hilos, CUDA...)
+                self._executor = ProcessPoolExecutor(self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def submit(self, kind: str, data: Any, title: str, **options) -> Optional[str]:
+        """
+        Encola un render ('image', 'grid' o 'heatmap') y vuelve enseguida.
+        :return: Ruta del PNG que se escribirá, o None si se descartó por estar el pool saturado.
+        """
+        from multiprocessing import shared_memory
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return None
+            self._pending += 1
+            self._sequence += 1
+            sequence = self._sequence
+        np = _np()
+        shm = target = None
+        try:
+            # Copia directa al segmento compartido (las listas imagen a imagen)
+            if isinstance(data, (list, tuple)):
+                first = _host_array(data[0])
+                shape, dtype = (len(data),) + first.shape, first.dtype
+            else:
+                data = _host_array(data)
+                shape, dtype = data.shape, data.dtype
+            shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+            target = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            if isinstance(data, (list, tuple)):
+                for i, item in enumerate(data):
+                    target[i] = _host_array(item)
+            else:
+                target[...] = data
+            del target
+            slug = ''.join(c if c.isalnum() or c in '-_' else '_' for c in title)[:60]
+            path = os.path.join(self.output_dir, f"{sequence:06d}_{slug}.png")
+            future = self._start().submit(_render_job, kind, shm.name, shape, dtype.str, path, options)
+        except Exception:
+            # Sin trabajo encolado nadie liberaría el segmento: se quedaría en /dev/shm
+            target = None  # La vista debe soltarse antes de cerrar el segmento
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(lambda f, shm=shm: self._finished(f, shm))
+        return path
+
+    def _finished(self, future, shm):
+        shm.close()
+        shm.unlink()
+        with self._lock:
+            self._pending -= 1
+            if future.exception() is not None:
+                self.errors += 1
+                self.last_error = future.exception()
+            else:
+                self.rendered += 1
+
+    def close(self, wait: bool = True):
+        """Espera (o no) a los renders pendientes y detiene los procesos"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+_SPARK = "▁▂▃▄▅▆▇█"
+
+
+def _sparkline(counts: list) -> str:
+    """Histograma en una línea de texto"""
+    top = max(counts) if counts else 0
+    if not top:
+        return ""
+    return ''.join(_SPARK[round(c / top * (len(_SPARK) - 1))] if c else ' '
+                   for c in counts)
+
+
+def _is_tf(value: Any) -> bool:
+    """Tensor o variable de TensorFlow, sin importar tensorflow si nadie lo ha hecho"""
+    tf = sys.modules.get('tensorflow')
+    return tf is not None and (isinstance(value, tf.Tensor) or isinstance(value, tf.Variable))
+
+
+def _weight_summary(w: Any, bins: int = 40) -> dict:
+    """
+    Estadísticas e histograma de un peso calculados en su propio dispositivo.
+    Al host solo llegan escalares y los `bins` conteos del histograma.
+    """
+    if _is_tf(w):
+        tf = sys.modules['tensorflow']
+        flat = tf.reshape(w, [-1])
+        size = int(flat.shape[0])
+        if flat.dtype.is_floating:
+            finite = tf.boolean_mask(flat, tf.math.is_finite(flat))
+            nan = int(tf.reduce_sum(tf.cast(tf.math.is_nan(flat), tf.int64)))
+        else:
+            finite, nan = flat, 0
+        finite = tf.cast(finite, tf.float64)
+        count = int(finite.shape[0])
+        inf = size - count - nan
+        if count:
+            mean = tf.reduce_mean(finite)
+            low, high, mean, std = (float(v) for v in tf.stack([
+                tf.reduce_min(finite), tf.reduce_max(finite), mean, tf.math.reduce_std(finite)]).numpy())
+            hist = tf.histogram_fixed_width(finite, [low, high if high > low else low + 1.0], nbins=bins).numpy().tolist()
+    else:
+        count, nan, inf, _, size, low, high, mean, m2, _ = _chunk_stats(w, 0, None)
+        std = (m2 / count) ** 0.5 if count else 0.0
+        if count and _is_torch(w):
+            torch = sys.modules['torch']
+            flat = w.detach().reshape(-1)
+            finite = flat[torch.isfinite(flat)] if flat.is_floating_point() else flat
+            hist = torch.histc(finite.float(), bins=bins, min=low, max=high if high > low else low + 1.0).tolist()
+        elif count:
+            np = _np()
+            flat = _to_host(w)
+            finite = flat[np.isfinite(flat)] if flat.dtype.kind == 'f' else flat
+            hist = np.histogram(finite, bins=bins, range=(low, high if high > low else low + 1.0))[0].tolist()
+    if not count:
+        low = high = mean = std = None
+        hist = []
+    return {'size': size, 'count': count, 'nan': nan, 'inf': inf, 'min': low, 'max': high,
+            'mean': mean, 'std': std, 'histogram': [int(c) for c in hist]}
+
+
+def _pooled_heatmap(w: Any, max_bytes: int) -> tuple:
+    """
+    Reduce un peso a una matriz 2D (filas, resto) y la promedia por bloques en su
+    dispositivo hasta que ocupe como mucho max_bytes en float32 antes de copiarla al host.
+    :return: (matriz numpy float32, (alto de bloque, ancho de bloque))
+    """
+    shape = tuple(int(d) for d in w.shape)
+    rows = shape[0]
+    cols = 1
+    for dim in shape[1:]:
+        cols *= dim
+    budget = max(1, max_bytes // 4)
+    block_rows = block_cols = 1
+    if rows * cols > budget:
+        # Salida lo más cuadrada posible con filas_salida * columnas_salida <= budget
+        out_rows = max(1, min(rows, budget, int((budget * rows / cols) ** 0.5)))
+        block_rows = -(-rows // out_rows)
+        out_cols = max(1, budget // -(-rows // block_rows))
+        block_cols = -(-cols // out_cols)
+    if _is_torch(w):
+        torch = sys.modules['torch']
+        matrix = w.detach().reshape(rows, cols).float()
+        if (block_rows, block_cols) != (1, 1):
+            pooled = torch.nn.functional.avg_pool2d(matrix[None, None], (block_rows, block_cols), ceil_mode=True)
+            matrix = pooled[0, 0]
+        return matrix.cpu().numpy(), (block_rows, block_cols)
+    if _is_tf(w):
+        tf = sys.modules['tensorflow']
+        matrix = tf.cast(tf.reshape(w, [rows, cols]), tf.float32)
+        if (block_rows, block_cols) != (1, 1):
+            # 'SAME' no cuenta el relleno al promediar los bloques del borde
+            matrix = tf.nn.avg_pool2d(matrix[None, :, :, None], (block_rows, block_cols),
+                                      (block_rows, block_cols), 'SAME')[0, :, :, 0]
+        return matrix.numpy(), (block_rows, block_cols)
+    np = _np()
+    matrix = _host_array(w).reshape(rows, cols).astype(np.float32)
+    if (block_rows, block_cols) != (1, 1):
+        out_rows, out_cols = -(-rows // block_rows), -(-cols // block_cols)
+        padded = np.full((out_rows * block_rows, out_cols * block_cols), np.nan, dtype=np.float32)
+        padded[:rows, :cols] = matrix
+        matrix = np.nanmean(padded.reshape(out_rows, block_rows, out_cols, block_cols), axis=(1, 3))
+    return matrix, (block_rows, block_cols)
+
+
+def _iter_weights(model: Any):
+    """(nombre, peso) de un modelo PyTorch, Keras o de un dict nombre -> array (p. ej. state_dict)"""
+    if hasattr(model, 'named_parameters'):
+        yield from model.named_parameters()
+    elif hasattr(model, 'layers'):
+        for layer in model.layers:
+            for idx, w in enumerate(getattr(layer, 'weights', [])):
+                yield f"{layer.name}/{idx}", w
+    else:
+        yield from model.items()
+
+
+def _gather(w: Any, index: "np.ndarray", cache: dict, key: tuple) -> "np.ndarray":
+    """Valores de w (aplanado) en las posiciones index, leídos en su dispositivo"""
+    if _is_torch(w):
+        torch = sys.modules['torch']
+        device_index = cache.get(key)
+        if device_index is None or device_index.device != w.device:
+            device_index = cache[key] = torch.from_numpy(index).to(w.device)
+        return w.detach().reshape(-1)[device_index].float().cpu().numpy()
+    if _is_tf(w):
+        tf = sys.modules['tensorflow']
+        return tf.cast(tf.gather(tf.reshape(w, [-1]), index), tf.float32).numpy()
+    return _to_host(w)[index].astype(_np().float32)
+
+
+_SNAPSHOT_STATS = ('size', 'count', 'nan', 'inf', 'min', 'max', 'mean', 'std', 'norm')
+_SNAPSHOT_QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+def _hll_update(registers: "np.ndarray", hashes: "np.ndarray"):
+    """Añade hashes uint64 a un HyperLogLog de len(registers) = 2**p registros (vectorizado)"""
+    np = _np()
+    p = int(len(registers)).bit_length() - 1
+    width = 64 - p
+    index = (hashes >> np.uint64(width)).astype(np.intp)
+    rest = hashes & np.uint64((1 << width) - 1)
+    # rango = ceros a la izquierda en los `width` bits restantes + 1 (frexp da la longitud en bits)
+    bit_length = np.frexp(rest.astype(np.float64))[1]
+    rank = (width - bit_length + 1).astype(np.uint8)
+    np.maximum.at(registers, index, rank)
+
+
+def _hll_estimate(registers: "np.ndarray") -> float:
+    """Estimación de cardinalidad de HyperLogLog con corrección para rangos pequeños"""
+    np = _np()
+    m = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / float(np.sum(np.ldexp(1.0, -registers.astype(np.int64))))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)  # Conteo lineal
+    return float(estimate)
+
+
+class DataFrameProfiler:
+    """
+    Perfil de un DataFrame procesado por bloques, con memoria acotada por columna:
+    dtype, nulos, cardinalidad aproximada (HyperLogLog), valores más frecuentes
+    (Misra-Gries, en columnas no numéricas) y, en columnas numéricas, min/max/media exactos y cuantiles
+    aproximados sobre una muestra uniforme (bottom-k).
+    :param top_k: Valores frecuentes a mostrar por columna.
+    :param sample_size: Tamaño de la muestra por columna numérica para los cuantiles.
+    :param hll_precision: Bits de índice del HyperLogLog (2**p registros, error ~1.04/sqrt(2**p)).
+    """
+    def __init__(self, top_k: int = 5, sample_size: int = 10000, hll_precision: int = 12, seed: int = 0):
+        self.top_k = top_k
+        self.sample_size = sample_size
+        self.hll_precision = hll_precision
+        self.rows = 0
+        self.chunks = 0
+        self.memory_bytes = 0
+        self.columns = {}
+        self._rng = _np().random.default_rng(seed)
+
+    def _column(self, name: str, series) -> dict:
+        np = _np()
+        state = self.columns.get(name)
+        if state is None:
+            state = self.columns[name] = {
+                'dtype': str(series.dtype), 'count': 0, 'nulls': 0,
+                'hll': np.zeros(1 << self.hll_precision, dtype=np.uint8), 'frequent': {},
+                'numeric': series.dtype.kind in 'biuf', 'min': None, 'max': None, 'sum': 0.0,
+                'sample': np.empty(0), 'keys': np.empty(0),
+            }
+        elif str(series.dtype) != state['dtype'] and str(series.dtype) not in state['dtype'].split(' | '):
+            state['dtype'] += f" | {series.dtype}"
+        return state
+
+    def update(self, chunk: "pd.DataFrame"):
+        """Añade un bloque de filas al perfil"""
+        import pandas as pd
+        np = _np()
+        self.rows += len(chunk)
+        self.chunks += 1
+        self.memory_bytes += int(chunk.memory_usage(index=False).sum())
+        capacity = self.top_k * 20
+        for name in chunk.columns:
+            series = chunk[name]
+            state = self._column(str(name), series)
+            values = series.dropna()
+            state['count'] += len(series)
+            state['nulls'] += len(series) - len(values)
+            if not len(values):
+                continue
+            _hll_update(state['hll'], pd.util.hash_pandas_object(values, index=False).to_numpy())
+            if state['numeric'] and series.dtype.kind in 'biuf':
+                data = values.to_numpy(dtype=np.float64)
+                low, high = float(data.min()), float(data.max())
+                state['min'] = low if state['min'] is None else min(state['min'], low)
+                state['max'] = high if state['max'] is None else max(state['max'], high)
+                state['sum'] += float(data.sum())
+                # Muestra uniforme: se conservan los sample_size valores con menor clave aleatoria
+                keys = np.concatenate([state['keys'], self._rng.random(len(data))])
+                sample = np.concatenate([state['sample'], data])
+                if len(keys) > self.sample_size:
+                    keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+                    keys, sample = keys[keep], sample[keep]
+                state['keys'], state['sample'] = keys, sample
+                continue
+            state['numeric'] = False
+            # Misra-Gries por lotes: el bloque se resume con la misma capacidad (restando el
+            # conteo capacity+1) y luego se combina con el resumen acumulado
+            counts = values.value_counts()
+            if len(counts) > capacity:
+                counts = counts.iloc[:capacity] - counts.iloc[capacity]
+                counts = counts[counts > 0]
+            frequent = state['frequent']
+            for value, count in counts.items():
+                frequent[value] = frequent.get(value, 0) + int(count)
+            if len(frequent) > capacity:
+                cut = sorted(frequent.values(), reverse=True)[capacity]
+                state['frequent'] = {value: count - cut for value, count in frequent.items() if count > cut}
+
+    def report(self, quantiles=(0.05, 0.5, 0.95)) -> dict:
+        """Resumen por columna: dtype, nulls, null_pct, cardinality, top y min/max/mean/quantiles"""
+        np = _np()
+        result = {}
+        for name, state in self.columns.items():
+            non_null = state['count'] - state['nulls']
+            top = sorted(state['frequent'].items(), key=lambda item: -item[1])[:self.top_k]
+            column = {
+                'dtype': state['dtype'], 'nulls': state['nulls'],
+                'null_pct': state['nulls'] / state['count'] if state['count'] else 0.0,
+                'cardinality': round(_hll_estimate(state['hll'])) if non_null else 0,
+                'top': top,
+            }
+            if state['numeric'] and state['min'] is not None:
+                column.update({'min': state['min'], 'max': state['max'], 'mean': state['sum'] / non_null,
+                               'quantiles': dict(zip(quantiles, np.quantile(state['sample'], quantiles).tolist()))})
+            result[name] = column
+        return result
+
+
+# Posiciones del array de estado de track(): tamaño fijo por variable
+_TRACK_FIELDS = ('steps', 'count', 'mean', 'm2', 'min', 'max', 'nan', 'inf',
+                 'ema_mean', 'ema_std', 'ema_absmax', 'alert')
+_T = {field: i for i, field in enumerate(_TRACK_FIELDS)}
+
+
+# Niveles de log; un título con el nombre de un nivel (p. ej. "ERROR") lo usa
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "WARN": 30, "ERROR": 40, "CRITICAL": 50}
+LEVEL_NAMES = {10: "DEBUG", 20: "INFO", 30: "WARNING", 40: "ERROR", 50: "CRITICAL"}
+
+
+class StdoutSink:
+    """Escribe los mensajes en stdout con el formato de siempre: [TITULO] mensaje"""
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, records):
+        stream = self.stream or sys.stdout
+        stream.write(''.join(f"[{title}] {message}\n" for _, _, title, message in records))
+        stream.flush()
+
+    def close(self):
+        pass
+
+
+class RotatingFileSink:
+    """
+    Escribe los mensajes en un fichero de texto y lo rota al superar max_bytes.
+    :param path: Ruta del fichero de log.
+    :param max_bytes: Tamaño a partir del cual se rota (None para no rotar).
+    :param backups: Número de ficheros antiguos que se conservan (path.1, path.2, ...).
+    """
+    def __init__(self, path: str, max_bytes: Optional[int] = 10 * 1024 * 1024, backups: int = 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+
+    def format(self, timestamp, levelno, title, message):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+        return f"{stamp}.{int(timestamp % 1 * 1000):03d} {LEVEL_NAMES.get(levelno, levelno)} [{title}] {message}\n"
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def write(self, records):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(''.join(self.format(*record) for record in records))
+        self._file.flush()
+        if self.max_bytes is not None and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class JsonlSink(RotatingFileSink):
+    """Escribe un objeto JSON por línea: ts, level, title y message"""
+    def format(self, timestamp, levelno, title, message):
+        return json.dumps({"ts": timestamp, "level": LEVEL_NAMES.get(levelno, levelno),
+                           "title": title, "message": str(message)}, ensure_ascii=False) + "\n"
+
+
+# Histograma de tiempos: 8 cubos por potencia de dos (error relativo < 9%), tamaño fijo
+_TIMER_SUBBUCKETS = 8
+_TIMER_BUCKETS = 64 * _TIMER_SUBBUCKETS
+
+
+def _timer_bucket(ns: int) -> int:
+    """Cubo logarítmico de una duración en nanosegundos"""
+    bits = ns.bit_length()
+    if bits <= 4:
+        return ns
+    return (bits - 3) * _TIMER_SUBBUCKETS + ((ns >> (bits - 4)) & (_TIMER_SUBBUCKETS - 1))
+
+
+def _timer_bucket_value(bucket: int) -> float:
+    """Valor representativo (punto medio) de un cubo, en nanosegundos"""
+    if bucket < 2 * _TIMER_SUBBUCKETS:
+        return float(bucket)
+    bits = bucket // _TIMER_SUBBUCKETS + 3
+    low = (_TIMER_SUBBUCKETS + bucket % _TIMER_SUBBUCKETS) << (bits - 4)
+    return low + (1 << (bits - 4)) / 2
+
+
+# Picos de memoria de los temporizadores con memory=True abiertos, del más externo
+# al más interno. tracemalloc.reset_peak() es global: antes de reiniciarlo, un
+# temporizador anidado guarda el pico alcanzado en el que lo contiene, y al salir
+# le devuelve el suyo. Cada temporizador informa de su pico menos la memoria que
+# ya estaba asignada al entrar (lo que asignó el propio bloque). Es un estado del proceso, como tracemalloc: temporizadores
+# de memoria simultáneos en varios hilos no se separan entre sí.
+_memory_peaks = []
+
+
+class _Timer:
+    """Contexto y decorador devuelto por HeladoDeQueso.timer()"""
+    __slots__ = ('owner', 'name', 'cuda', 'memory', '_wall', '_cpu', '_started_tracing', '_baseline')
+
+    def __init__(self, owner, name: str, cuda: bool, memory: bool):
+        self.owner = owner
+        self.name = name
+        self.cuda = cuda
+        self.memory = memory
+
+    def __enter__(self):
+        if self.memory:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            elif _memory_peaks:
+                _memory_peaks[-1] = max(_memory_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            _memory_peaks.append(0)
+            self._baseline = tracemalloc.get_traced_memory()[0]
+        if self.cuda:
+            sys.modules['torch'].cuda.synchronize()
+        self._cpu = time.thread_time_ns()
+        self._wall = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.cuda:
+            sys.modules['torch'].cuda.synchronize()
+        wall = time.perf_counter_ns() - self._wall
+        cpu = time.thread_time_ns() - self._cpu
+        peak = None
+        if self.memory:
+            peak = max(_memory_peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if _memory_peaks:
+                _memory_peaks[-1] = max(_memory_peaks[-1], peak)
+            if self._started_tracing:
+                tracemalloc.stop()
+            peak -= self._baseline
+        self.owner._record_timing(self.name, wall, cpu, peak)
+        return False
+
+    def __call__(self, func):
+        owner, name, cuda, memory = self.owner, self.name, self.cuda, self.memory
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with _Timer(owner, name, cuda, memory):
+                return func(*args, **kwargs)
+        return timed
+
+
+class _NullTimer:
+    """Temporizador vacío del toolkit desactivado: no mide nada y como decorador no envuelve"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __call__(self, func):
+        return func
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Disabled:
+    """
+    Versiones vacías de los métodos de salida, con las mismas firmas.
+    Al desactivar el toolkit la instancia pasa a una subclase que hereda primero
+    de esta clase, así que cada llamada cuesta solo la llamada en sí.
+    """
+    def __bool__(self) -> bool:
+        return False
+
+    def log(self, message, title="INFO", level=None):
+        pass
+
+    def describe(self, variable, name, n=5, stats=True, chunk_size=1 << 22):
+        pass
+
+    def print_dict(self, data, title="DICT"):
+        pass
+
+    def print_df(self, df, title="DATAFRAME", profile=False, chunk_rows=100000, top_k=5,
+                 time_budget=None, sample_frac=None):
+        pass
+
+    def display_image(self, image, title="IMAGE", save_path=None):
+        pass
+
+    def display_image_grid(self, images, title="IMAGE GRID", ncols=5, save_path=None,
+                           max_images=None, max_side=None):
+        pass
+
+    def render_image_grid(self, images, path=None, ncols=None, max_images=None, max_side=None, pad=1):
+        pass
+
+    def display_model_weights(self, model, layer_name=None, bins=40, heatmaps=True,
+                              max_heatmap_bytes=256 * 1024):
+        pass
+
+    def track(self, name, tensor, every=100, drift_sigmas=4.0, explode_factor=10.0,
+              smoothing=0.1, warmup=5, chunk_size=1 << 22):
+        pass
+
+    def snapshot_weights(self, model, tag, sample_size=256, bins=16):
+        pass
+
+    def diff_weights(self, tag_a, tag_b, top=None):
+        pass
+
+    def timer(self, name, cuda=None, memory=False):
+        return _NULL_TIMER
+
+    def report(self, names=None, reset=False):
+        pass
+
 
 class HeladoDeQueso:
     """
     Toolkit para manejo de mensajes, depuración y análisis de datos/modelos en proyectos de Machine Learning y Deep Learning.
+
+    Con active=False los métodos de salida no hacen nada y la instancia es falsa,
+    así que para evitar también evaluar argumentos costosos basta con:
+        logger and logger.describe(tensor.detach(), name="x")
     """
-    def __init__(self, active: bool = True):
+    def __init__(self, active: bool = True, level: Union[str, int] = "DEBUG", sinks: Optional[list] = None,
+                 async_log: bool = True, rate_limit: Optional[float] = None,
+                 sample_every: Optional[dict] = None, flush_interval: float = 0.2,
+                 max_queue: int = 100000, renderer: Optional[RenderPool] = None):
         """
         Inicializa el toolkit.
         :param active: Si es False, desactiva toda la salida del toolkit.
+        :param level: Nivel mínimo de los mensajes de log (nombre o número).
+        :param sinks: Salidas de log (StdoutSink, RotatingFileSink, JsonlSink...). Por defecto stdout.
+        :param async_log: Si es True, log() solo encola y un hilo escribe los mensajes por lotes.
+        :param rate_limit: Máximo de mensajes por segundo para cada título (None sin límite).
+        :param sample_every: {título: n} para conservar solo uno de cada n mensajes de ese título.
+        :param flush_interval: Segundos máximos que un mensaje espera en la cola.
+        :param max_queue: Tamaño máximo de la cola; si se llena se descartan mensajes.
+        :param renderer: RenderPool opcional; si se indica, las figuras se escriben en disco
+                         desde procesos en segundo plano en lugar de mostrarse con plt.show().
         """
+        self.level = LEVELS.get(level, level) if isinstance(level, str) else level
+        self.sinks = sinks if sinks is not None else [StdoutSink()]
+        self.async_log = async_log
+        self.rate_limit = rate_limit
+        self.sample_every = sample_every or {}
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.renderer = renderer
+        self._buffer = deque()
+        self._buckets = {}  # título -> [tokens, último instante]
+        self._sample_counts = Counter()
+        self._suppressed = Counter()
+        self._suppressed_lock = threading.Lock()  # Incrementos (hilo que llama) frente al vaciado
+        self._drain_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._closed = False
+        self._tracked = {}  # nombre -> array float64 con los campos de _TRACK_FIELDS
+        self.snapshot_dir = "helado_snapshots"
+        self._snapshot_index = {}  # (capa, tamaño, muestra) -> posiciones muestreadas (en su dispositivo)
+        self._timings = {}  # nombre -> [n, total, min, max, cpu total, pico de memoria, histograma]
+        self._timings_lock = threading.Lock()
+        self._cuda = None  # Se comprueba una vez, al primer timer()
         self.active = active
 
-    def log(self, message: str, title: str = "INFO"):
+    @property
+    def active(self) -> bool:
+        return not isinstance(self, _Disabled)
+
+    @active.setter
+    def active(self, value: bool):
+        """Activa o desactiva el toolkit cambiando la clase de la instancia"""
+        cls = type(self)
+        base = cls.__bases__[1] if issubclass(cls, _Disabled) else cls
+        self.__class__ = base if value else base._disabled_class()
+
+    @classmethod
+    def _disabled_class(cls):
+        """Subclase (cacheada) de cls con los métodos de salida vacíos"""
+        disabled = cls.__dict__.get('_disabled')
+        if disabled is None:
+            disabled = type(f"{cls.__name__}Desactivado", (_Disabled, cls), {})
+            cls._disabled = disabled
+        return disabled
+
+    def log(self, message: Any, title: str = "INFO", level: Union[str, int, None] = None):
         """
-        Imprime un mensaje con un título contextual.
+        Registra un mensaje con un título contextual. En modo asíncrono solo lo
+        encola: el mensaje se convierte a texto y se escribe en el hilo de fondo.
+        :param message: Mensaje (se formatea con str() al escribirlo).
+        :param title: Título contextual; si es un nombre de nivel también fija el nivel.
+        :param level: Nivel explícito (nombre o número); por defecto se deduce del título o INFO.
         """
-        if not self.active:
+        if level is None:
+            levelno = LEVELS.get(title, 20)
+        else:
+            levelno = LEVELS.get(level, level) if isinstance(level, str) else level
+        if levelno < self.level:
+            return
+        if (self.rate_limit is not None or self.sample_every) and not self._admit(title):
+            self._suppress(title)
             return
-        print(f"[{title}] {message}")
+        record = (time.time(), levelno, title, message)
+        if not self.async_log:
+            self._write([record])
+            return
+        buffer = self._buffer
+        if len(buffer) >= self.max_queue:
+            self._suppress(title)
+            return
+        buffer.append(record)
+        if self._worker is None:
+            self._start_worker()
+        elif len(buffer) == self.max_queue // 2:
+            self._wake.set()  # Cola a medias: no esperar al siguiente intervalo
+
+    def _admit(self, title: str) -> bool:
+        """Muestreo y límite de mensajes por segundo (token bucket) de un título"""
+        every = self.sample_every.get(title)
+        if every:
+            self._sample_counts[title] += 1
+            if (self._sample_counts[title] - 1) % every:
+                return False
+        if self.rate_limit is None:
+            return True
+        now = time.monotonic()
+        bucket = self._buckets.get(title)
+        if bucket is None:
+            bucket = self._buckets[title] = [max(1.0, self.rate_limit), now]
+        else:
+            bucket[0] = min(max(1.0, self.rate_limit), bucket[0] + (now - bucket[1]) * self.rate_limit)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def _suppress(self, title: str):
+        """Cuenta un mensaje descartado; _drain() lee y reinicia los contadores"""
+        with self._suppressed_lock:
+            self._suppressed[title] += 1
+
+    def _start_worker(self):
+        """Arranca (una vez) el hilo que vacía la cola de log"""
+        with self._drain_lock:
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(target=self._worker_loop, name="helado-log", daemon=True)
+            self._worker.start()
+        atexit.register(self.flush)
+
+    def _worker_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._drain()
+
+    def _write(self, records: list):
+        """Entrega un lote a todas las salidas; un fallo en una no afecta a las demás"""
+        for sink in self.sinks:
+            try:
+                sink.write(records)
+            except Exception as e:
+                print(f"[HELADO] Error escribiendo log en {type(sink).__name__}: {e}", file=sys.stderr)
+
+    def _drain(self):
+        """Vacía la cola y escribe su contenido como un único lote"""
+        with self._drain_lock:
+            buffer = self._buffer
+            records = []
+            try:
+                while True:
+                    records.append(buffer.popleft())
+            except IndexError:
+                pass
+            if self._suppressed:
+                # Con el mismo cerrojo que _suppress(): no se pierde ningún incremento
+                with self._suppressed_lock:
+                    suppressed, self._suppressed = self._suppressed, Counter()
+                records.extend((time.time(), 30, title, f"{count} mensaje(s) suprimido(s) por límite o muestreo")
+                               for title, count in suppressed.items())
+            if records:
+                self._write(records)
+
+    def flush(self):
+        """Escribe ya los mensajes pendientes (se llama también al salir)"""
+        if self._buffer or self._suppressed:
+            self._drain()
+
+    def close(self):
+        """Detiene el hilo de log, escribe lo pendiente y cierra las salidas"""
+        self._closed = True
+        self.async_log = False  # Lo que se registre después se escribe directamente
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        self._drain()
+        for sink in self.sinks:
+            sink.close()
+        if self.renderer is not None:
+            self.renderer.close()
 
-    def describe(self, variable: Any, name: str, n: int = 5):
+    def describe(self, variable: Any, name: str, n: int = 5, stats: bool = True, chunk_size: int = 1 << 22):
         """
-        Imprime información sobre una variable: nombre, tipo, forma y primeros elementos.
+        Imprime información sobre una variable: nombre, tipo, forma, primeros elementos y,
+        para arrays y tensores numéricos, un resumen estadístico.
         :param variable: Variable a describir.
         :param name: Nombre de la variable.
         :param n: Número de elementos a mostrar.
+        :param stats: Si es True, muestra min/max/media/std, NaN/Inf, dispersión y cuantiles aproximados.
+        :param chunk_size: Elementos por bloque al recorrer arrays grandes o memmaps.
         """
-        if not self.active:
-            return
+        self.flush()  # Mantiene el orden con los mensajes de log encolados
         print(f"\n[DESCRIBE] {name}")
         print(f"  Tipo: {type(variable)}")
         # Forma
         shape = getattr(variable, 'shape', None)
         if shape is not None:
-            print(f"  Forma: {shape}")
+            dtype = getattr(variable, 'dtype', None)
+            print(f"  Forma: {shape}" + (f"  dtype: {dtype}" if dtype is not None else ""))
         # Primeros elementos
         try:
-            if isinstance(variable, (np.ndarray, list, tuple)):
+            if isinstance(variable, (list, tuple)):
                 preview = variable[:n]
-            elif hasattr(variable, 'cpu') and hasattr(variable, 'numpy'):
-                # PyTorch tensor
-                preview = variable.cpu().numpy().flatten()[:n]
-            elif hasattr(variable, 'numpy'):
-                # TensorFlow tensor
-                preview = variable.numpy().flatten()[:n]
+            elif shape is not None and (_is_ndarray(variable) or hasattr(variable, 'numpy')
+                                        or hasattr(variable, '__getitem__')):
+                # Solo se copian al host las filas necesarias para la vista previa
+                preview = _head(variable, n)
             else:
                 preview = str(variable)
             print(f"  Primeros {n} elementos: {preview}")
         except Exception as e:
             print(f"  No se pudo mostrar preview: {e}")
+        # Resumen estadístico
+        if not stats or not (shape is not None or isinstance(variable, (list, tuple))):
+            return
+        try:
+            summary = summarize(variable, chunk_size=chunk_size)
+        except Exception as e:
+            print(f"  Sin estadísticas: {e}")
+            return
+        if summary['count']:
+            print(f"  Min: {summary['min']:.6g}  Max: {summary['max']:.6g}  "
+                  f"Media: {summary['mean']:.6g}  Std: {summary['std']:.6g}")
+        print(f"  NaN: {summary['nan']}  Inf: {summary['inf']}  Ceros: {summary['sparsity']:.2%}")
+        if summary['quantiles']:
+            print("  Cuantiles (aprox.): " + "  ".join(f"p{q * 100:g}={value:.6g}"
+                                                     for q, value in summary['quantiles'].items()))
+
+    def track(self, name: str, tensor: Any, every: int = 100, drift_sigmas: float = 4.0,
+              explode_factor: float = 10.0, smoothing: float = 0.1, warmup: int = 5,
+              chunk_size: int = 1 << 22):
+        """
+        Acumula estadísticas de una variable paso a paso y solo avisa cuando hace falta.
+        Por cada nombre se guarda un array de tamaño fijo (media/varianza de Welford, min/max,
+        NaN/Inf y medias móviles), así que la memoria no crece con el número de pasos.
+        :param name: Nombre de la variable seguida.
+        :param tensor: Array o tensor de este paso.
+        :param every: Emite un resumen cada `every` pasos (0 para solo avisos).
+        :param drift_sigmas: Aviso si la media del paso se aleja más de tantas std de la media móvil.
+        :param explode_factor: Aviso si el máximo absoluto supera tantas veces su media móvil.
+        :param smoothing: Peso del paso actual en las medias móviles.
+        :param warmup: Pasos iniciales sin avisos de deriva mientras se estabilizan las medias móviles.
+        :param chunk_size: Elementos por bloque al reducir arrays grandes.
+        """
+        state = self._tracked.get(name)
+        if state is None:
+            np = _np()
+            state = self._tracked[name] = np.zeros(len(_TRACK_FIELDS))
+            state[_T['min']], state[_T['max']] = np.inf, -np.inf
+        # Estadísticas de este paso
+        count = nan = inf = 0
+        mean = m2 = 0.0
+        low, high = float('inf'), float('-inf')
+        for chunk in _iter_chunks(tensor, chunk_size):
+            c_count, c_nan, c_inf, _, _, c_low, c_high, c_mean, c_m2, _ = _chunk_stats(chunk, 0, None)
+            nan, inf = nan + c_nan, inf + c_inf
+            if c_count:
+                count, mean, m2 = _merge_moments(count, mean, m2, c_count, c_mean, c_m2)
+                low, high = min(low, c_low), max(high, c_high)
+        std = (m2 / count) ** 0.5 if count else 0.0
+        absmax = max(abs(low), abs(high)) if count else 0.0
+
+        steps = int(state[_T['steps']]) + 1
+        reasons = []
+        if nan or inf:
+            reasons.append(f"{nan} NaN / {inf} Inf")
+        if count and steps > 1:
+            ema_mean, ema_std, ema_absmax = state[_T['ema_mean']], state[_T['ema_std']], state[_T['ema_absmax']]
+            if steps > warmup and abs(mean - ema_mean) > drift_sigmas * max(ema_std, 1e-12):
+                reasons.append(f"deriva de la media {ema_mean:.4g} → {mean:.4g}")
+            if ema_absmax > 0 and absmax > explode_factor * ema_absmax:
+                reasons.append(f"explosión |max| {ema_absmax:.4g} → {absmax:.4g}")
+
+        # Acumulados de toda la ejecución y medias móviles (sin guardar historial)
+        state[_T['steps']] = steps
+        state[_T['count']], state[_T['mean']], state[_T['m2']] = _merge_moments(
+            state[_T['count']], state[_T['mean']], state[_T['m2']], count, mean, m2)
+        state[_T['nan']] += nan
+        state[_T['inf']] += inf
+        if count:
+            state[_T['min']] = min(state[_T['min']], low)
+            state[_T['max']] = max(state[_T['max']], high)
+            if steps == 1 or not state[_T['ema_absmax']]:
+                state[_T['ema_mean']], state[_T['ema_std']], state[_T['ema_absmax']] = mean, std, absmax
+            else:
+                keep = 1.0 - smoothing
+                state[_T['ema_mean']] = keep * state[_T['ema_mean']] + smoothing * mean
+                state[_T['ema_std']] = keep * state[_T['ema_std']] + smoothing * std
+                state[_T['ema_absmax']] = keep * state[_T['ema_absmax']] + smoothing * absmax
+
+        # Solo se avisa al cruzar el umbral, no en cada paso mientras siga cruzado
+        if reasons and not state[_T['alert']]:
+            self.log(f"{name} paso {steps}: ⚠️ {'; '.join(reasons)}", title="TRACK", level="WARNING")
+        state[_T['alert']] = 1.0 if reasons else 0.0
+        if every and steps % every == 0:
+            self.log(f"{name} paso {steps}: media={mean:.4g} std={std:.4g} min={low:.4g} max={high:.4g} "
+                     f"| acumulado media={state[_T['mean']]:.4g} "
+                     f"std={(state[_T['m2']] / max(state[_T['count']], 1)) ** 0.5:.4g} "
+                     f"NaN={int(state[_T['nan']])} Inf={int(state[_T['inf']])}", title="TRACK")
+
+    def tracked(self, name: str) -> dict:
+        """
+        Estadísticas acumuladas por track() para una variable.
+        :param name: Nombre de la variable seguida.
+        :return: dict con steps, count, mean, std, min, max, nan, inf y las medias móviles.
+        """
+        state = self._tracked[name]
+        stats = {field: float(state[i]) for i, field in enumerate(_TRACK_FIELDS) if field not in ('m2', 'alert')}
+        for field in ('steps', 'count', 'nan', 'inf'):
+            stats[field] = int(stats[field])
+        stats['std'] = float(state[_T['m2']] / state[_T['count']]) ** 0.5 if state[_T['count']] else None
+        return stats
+
+    def reset_tracking(self, name: Optional[str] = None):
+        """Olvida las estadísticas de una variable seguida (o de todas)"""
+        if name is None:
+            self._tracked.clear()
+        else:
+            self._tracked.pop(name, None)
+
+    def _snapshot_path(self, tag: str) -> str:
+        safe = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in str(tag))
+        return os.path.join(self.snapshot_dir, f"{safe}.npz")
+
+    def snapshot_weights(self, model: Any, tag: str, sample_size: int = 256, bins: int = 16) -> str:
+        """
+        Guarda una huella compacta de los pesos de un modelo en snapshot_dir/<tag>.npz.
+        Por capa: estadísticas y norma, cuantiles aproximados, un histograma y una muestra
+        de sample_size valores en posiciones fijas (las mismas en cada snapshot),
+        que permite estimar el tamaño de la actualización entre dos snapshots.
+        :param model: Modelo PyTorch o Keras, o dict nombre -> array/tensor.
+        :param tag: Nombre del snapshot (p. ej. "paso_1000").
+        :param sample_size: Valores muestreados por capa (0 para no guardar muestra).
+        :param bins: Intervalos del histograma por capa.
+        :return: Ruta del fichero escrito.
+        """
+        np = _np()
+        names, stats, quantiles, histograms, samples = [], [], [], [], []
+        torch = sys.modules.get('torch')
+        no_grad = torch.no_grad() if torch is not None else contextlib.nullcontext()
+        with no_grad:
+            for name, w in _iter_weights(model):
+                summary = _weight_summary(w, bins)
+                size, count = summary['size'], summary['count']
+                mean, std = summary['mean'] or 0.0, summary['std'] or 0.0
+                norm = (count * (std * std + mean * mean)) ** 0.5
+                sample = np.full(sample_size, np.nan, dtype=np.float32)
+                if sample_size and size:
+                    key = (name, size, sample_size)
+                    index = self._snapshot_index.get((key, 'host'))
+                    if index is None:
+                        rng = np.random.default_rng(zlib.crc32(name.encode('utf-8')) ^ size)
+                        index = self._snapshot_index[(key, 'host')] = np.sort(rng.integers(0, size, sample_size))
+                    sample = _gather(w, index, self._snapshot_index, key)
+                finite = sample[np.isfinite(sample)]
+                names.append(name)
+                stats.append([size, count, summary['nan'], summary['inf'], summary['min'] or 0.0,
+                              summary['max'] or 0.0, mean, std, norm])
+                quantiles.append(np.quantile(finite, _SNAPSHOT_QUANTILES) if finite.size
+                                 else np.full(len(_SNAPSHOT_QUANTILES), np.nan))
+                histograms.append(np.pad(summary['histogram'], (0, bins - len(summary['histogram']))))
+                samples.append(sample)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = self._snapshot_path(tag)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez_compressed(
+                f, names=np.array(names), stats=np.array(stats, dtype=np.float64).reshape(-1, len(_SNAPSHOT_STATS)),
+                quantiles=np.array(quantiles, dtype=np.float32).reshape(-1, len(_SNAPSHOT_QUANTILES)),
+                histograms=np.array(histograms, dtype=np.int64).reshape(-1, bins),
+                samples=np.array(samples, dtype=np.float32).reshape(-1, sample_size),
+                meta=np.array(json.dumps({'tag': str(tag), 'time': time.time(), 'sample_size': sample_size})))
+        os.replace(temp_path, path)
+        return path
+
+    def _load_snapshot(self, tag: str) -> dict:
+        np = _np()
+        with np.load(self._snapshot_path(tag)) as data:
+            snapshot = {key: data[key] for key in data.files}
+        snapshot['meta'] = json.loads(str(snapshot['meta']))
+        return snapshot
+
+    def diff_weights(self, tag_a: str, tag_b: str, top: Optional[int] = None) -> list:
+        """
+        Compara dos snapshots de snapshot_weights() e imprime, por capa, cuánto han cambiado.
+        La actualización relativa ||b - a|| / ||a|| se estima con las muestras en posiciones fijas.
+        :param tag_a: Snapshot de referencia.
+        :param tag_b: Snapshot posterior.
+        :param top: Si se indica, muestra solo las `top` capas con mayor actualización relativa.
+        :return: Lista de dicts por capa (layer, norm_a, norm_b, norm_change, relative_update, median_shift).
+        """
+        np = _np()
+        a, b = self._load_snapshot(tag_a), self._load_snapshot(tag_b)
+        rows_a = {name: i for i, name in enumerate(a['names'].tolist())}
+        same_sample = a['meta']['sample_size'] == b['meta']['sample_size'] and a['meta']['sample_size'] > 0
+        col = {field: i for i, field in enumerate(_SNAPSHOT_STATS)}
+        median = _SNAPSHOT_QUANTILES.index(0.5)
+        report = []
+        for j, name in enumerate(b['names'].tolist()):
+            i = rows_a.get(name)
+            if i is None or a['stats'][i, col['size']] != b['stats'][j, col['size']]:
+                continue
+            norm_a, norm_b = a['stats'][i, col['norm']], b['stats'][j, col['norm']]
+            relative_update = None
+            if same_sample:
+                delta = b['samples'][j] - a['samples'][i]
+                delta = delta[np.isfinite(delta)]
+                if delta.size and norm_a > 0:
+                    rms = float(np.sqrt(np.mean(delta * delta)))
+                    relative_update = rms * float(a['stats'][i, col['count']]) ** 0.5 / float(norm_a)
+            std_a = a['stats'][i, col['std']]
+            report.append({
+                'layer': name, 'norm_a': float(norm_a), 'norm_b': float(norm_b),
+                'norm_change': float((norm_b - norm_a) / norm_a) if norm_a else None,
+                'relative_update': relative_update,
+                'median_shift': float((b['quantiles'][j, median] - a['quantiles'][i, median]) / std_a)
+                if std_a else None,
+            })
+        report.sort(key=lambda row: -(row['relative_update'] or 0.0))
+        self.flush()
+        print(f"\n[DIFF] {tag_a} → {tag_b} ({len(report)} capas)")
+        print(f"  {'Capa':<40} {'||a||':>10} {'||b||':>10} {'Δnorma':>8} {'act. rel.':>9} {'Δmediana':>9}")
+
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else '-'
+
+        for row in report[:top] if top else report:
+            print(f"  {row['layer'][:40]:<40} {row['norm_a']:10.4g} {row['norm_b']:10.4g} "
+                  f"{fmt(row['norm_change'], '+8.2%'):>8} {fmt(row['relative_update'], '9.2%'):>9} "
+                  f"{fmt(row['median_shift'], '+9.3f'):>9}")
+        return report
+
+    def timer(self, name: str, cuda: Optional[bool] = None, memory: bool = False) -> _Timer:
+        """
+        Mide un bloque de código como contexto o decorador:
+            with logger.timer("forward"): ...
+            @logger.timer("carga")
+            def cargar(...): ...
+        Registra tiempo real y de CPU (del hilo) en un histograma por nombre; ver report().
+        Con el toolkit desactivado devuelve un temporizador vacío (y el decorador no envuelve la función).
+        :param name: Nombre de la medida.
+        :param cuda: Sincroniza CUDA al entrar y salir para medir el trabajo de la GPU
+                     (por defecto, si torch está importado y hay GPU).
+        :param memory: Si es True, registra también el pico de memoria con tracemalloc (más lento).
+                       Es el pico sobre la memoria ya asignada al entrar en el bloque. Se puede
+                       anidar: el pico de un bloque interno cuenta para el externo.
+        """
+        if cuda is None:
+            if self._cuda is None:
+                torch = sys.modules.get('torch')
+                self._cuda = bool(torch is not None and torch.cuda.is_available())
+            cuda = self._cuda
+        return _Timer(self, name, cuda, memory)
+
+    def _record_timing(self, name: str, wall: int, cpu: int, peak: Optional[int]):
+        with self._timings_lock:
+            stats = self._timings.get(name)
+            if stats is None:
+                stats = self._timings[name] = [0, 0, wall, wall, 0, None, [0] * _TIMER_BUCKETS]
+            stats[0] += 1
+            stats[1] += wall
+            if wall < stats[2]:
+                stats[2] = wall
+            if wall > stats[3]:
+                stats[3] = wall
+            stats[4] += cpu
+            if peak is not None and (stats[5] is None or peak > stats[5]):
+                stats[5] = peak
+            stats[6][min(_timer_bucket(wall), _TIMER_BUCKETS - 1)] += 1
+
+    def report(self, names: Optional[List[str]] = None, reset: bool = False) -> dict:
+        """
+        Imprime una tabla con n, total, media, p50/p95/p99 y máximo de cada timer().
+        Los percentiles salen del histograma logarítmico (error relativo < 9%).
+        :param names: Nombres a mostrar (por defecto todos).
+        :param reset: Si es True, borra las medidas después de mostrarlas.
+        :return: dict nombre -> estadísticas en milisegundos (y bytes para la memoria).
+        """
+        with self._timings_lock:
+            timings = {name: (stats[:6], list(stats[6])) for name, stats in self._timings.items()
+                       if names is None or name in names}
+            if reset:
+                for name in timings:
+                    self._timings.pop(name, None)
+        result = {}
+        for name, ((count, total, low, high, cpu, peak), histogram) in timings.items():
+            percentiles = {}
+            targets = [(q, q * count) for q in (0.5, 0.95, 0.99)]
+            seen = 0
+            for bucket, bucket_count in enumerate(histogram):
+                seen += bucket_count
+                while targets and seen >= targets[0][1]:
+                    q, _ = targets.pop(0)
+                    percentiles[q] = min(max(_timer_bucket_value(bucket), low), high) / 1e6
+                if not targets:
+                    break
+            result[name] = {'n': count, 'total_ms': total / 1e6, 'mean_ms': total / count / 1e6,
+                            'p50_ms': percentiles[0.5], 'p95_ms': percentiles[0.95], 'p99_ms': percentiles[0.99],
+                            'max_ms': high / 1e6, 'cpu_mean_ms': cpu / count / 1e6, 'peak_memory_bytes': peak}
+        self.flush()
+        print("\n[TIMER] Resumen de tiempos (ms)")
+        print(f"  {'Nombre':<28} {'n':>8} {'total':>10} {'media':>9} {'p50':>9} {'p95':>9} {'p99':>9} "
+              f"{'max':>9} {'cpu':>9} {'memoria':>10}")
+        for name, row in sorted(result.items(), key=lambda item: -item[1]['total_ms']):
+            memory = f"{row['peak_memory_bytes'] / 2 ** 20:.1f} MiB" if row['peak_memory_bytes'] is not None else "-"
+            print(f"  {name[:28]:<28} {row['n']:>8} {row['total_ms']:>10.2f} {row['mean_ms']:>9.3f} "
+                  f"{row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['max_ms']:>9.3f} "
+                  f"{row['cpu_mean_ms']:>9.3f} {memory:>10}")
+        return result
 
     def print_dict(self, data: dict, title: str = "DICT"):
         """
         Imprime un diccionario de forma legible con indentación y título.
         """
-        if not self.active:
-            return
         import pprint
+        self.flush()
         print(f"\n[{title}] Diccionario:")
         pprint.pprint(data, indent=2, width=80, stream=sys.stdout)
 
-    def print_df(self, df: pd.DataFrame, title: str = "DATAFRAME"):
+    def print_df(self, df: Any, title: str = "DATAFRAME", profile: bool = False, chunk_rows: int = 100000,
+                 top_k: int = 5, time_budget: Optional[float] = None,
+                 sample_frac: Optional[float] = None) -> Optional[dict]:
         """
-        Imprime un DataFrame mostrando head, tail e info general.
+        Imprime un DataFrame mostrando head, tail e info general, o un perfil por columnas.
+        :param df: DataFrame, o iterador de DataFrames (pd.read_csv(..., chunksize=...),
+                   lotes de Parquet con to_pandas()...), que se perfila por bloques.
+        :param title: Título de la salida.
+        :param profile: Si es True, muestra el perfil (se activa siempre con iteradores).
+        :param chunk_rows: Filas por bloque al perfilar un DataFrame en memoria.
+        :param top_k: Valores más frecuentes a mostrar por columna.
+        :param time_budget: Segundos máximos de perfilado; al agotarse se informa sobre las filas ya vistas.
+        :param sample_frac: Fracción de filas de cada bloque a muestrear (None para todas).
+        :return: dict con el perfil por columna (solo en modo perfil).
         """
-        if not self.active:
-            return
+        import pandas as pd
+        self.flush()
         print(f"\n[{title}] DataFrame:")
+        if isinstance(df, pd.DataFrame) and not profile:
+            print("Head:")
+            print(df.head())
+            print("\nTail:")
+            print(df.tail())
+            print("\nInfo:")
+            df.info(buf=sys.stdout)  # info() imprime y devuelve None
+            return None
+
+        np = _np()
+        profiler = DataFrameProfiler(top_k=top_k)
+        start = time.perf_counter()
+        total_rows = None
+        first = last = None
+        if isinstance(df, pd.DataFrame):
+            # El head sale del DataFrame, no del primer bloque visitado (que puede ser aleatorio)
+            first = df.head() if len(df) else None
+            total_rows = len(df)
+            starts = np.arange(0, total_rows, chunk_rows)
+            if time_budget is not None:
+                # Con presupuesto de tiempo los bloques se visitan en orden aleatorio:
+                # si se corta antes, lo visto es una muestra de todo el DataFrame
+                np.random.default_rng(0).shuffle(starts)
+            chunks = (df.iloc[int(i):int(i) + chunk_rows] for i in starts)
+        else:
+            chunks = (chunk.to_pandas() if hasattr(chunk, 'to_pandas') else chunk for chunk in df)
+        truncated = False
+        for chunk in chunks:
+            if first is None:
+                first = chunk.head()
+            last = chunk
+            if sample_frac is not None:
+                chunk = chunk.sample(frac=sample_frac, random_state=profiler.chunks)
+            profiler.update(chunk)
+            if time_budget is not None and time.perf_counter() - start > time_budget:
+                truncated = True
+                break
+        elapsed = time.perf_counter() - start
+        if first is None:
+            print("  (vacío)")
+            return {}
         print("Head:")
-        print(df.head())
-        print("\nTail:")
-        print(df.tail())
-        print("\nInfo:")
-        print(df.info())
+        print(first)
+        if not truncated and total_rows is None:
+            print("\nTail:")
+            print(last.tail())
+        report = profiler.report()
+        seen = f"{profiler.rows} filas" + (f" de {total_rows}" if total_rows is not None else "")
+        notes = " (muestra)" if sample_frac is not None else ""
+        notes += " (parcial: presupuesto de tiempo agotado)" if truncated else ""
+        print(f"\nPerfil: {seen}{notes}, {len(report)} columnas, "
+              f"{profiler.memory_bytes / 2 ** 20:.1f} MiB procesados en {elapsed:.2f}s")
+        print(f"  {'Columna':<24} {'dtype':<12} {'nulos':>8} {'card.≈':>9}  detalle")
+        for name, column in report.items():
+            if 'quantiles' in column:
+                q = column['quantiles']
+                detail = (f"min={column['min']:.4g} p5={q[0.05]:.4g} p50={q[0.5]:.4g} "
+                          f"p95={q[0.95]:.4g} max={column['max']:.4g} media={column['mean']:.4g}")
+            else:
+                detail = "top (≥): " + ", ".join(f"{str(value)[:20]!r}×{count}" for value, count in column['top'])
+            print(f"  {name[:24]:<24} {column['dtype'][:12]:<12} {column['null_pct']:>8.1%} "
+                  f"{column['cardinality']:>9}  {detail}")
+        return report
 
-    def display_image(self, image: Any, title: str = "IMAGE"):
+    def display_image(self, image: Any, title: str = "IMAGE", save_path: Optional[str] = None):
         """
         Muestra una imagen (NumPy array o tensor) con un título.
+        :param save_path: Si se indica, escribe la imagen como PNG en esa ruta sin usar matplotlib.
         """
-        if not self.active:
+        if save_path is None and self.renderer is not None:
+            self.renderer.submit('image', image, title)
+            return
+        img = _host_array(image)
+        if save_path is not None:
+            _write_png(img, save_path)
             return
+        plt = _plt()
         plt.figure()
         plt.title(title)
-        if hasattr(image, 'cpu') and hasattr(image, 'numpy'):
-            # PyTorch tensor
-            img = image.cpu().numpy()
-        elif hasattr(image, 'numpy'):
-            # TensorFlow tensor
-            img = image.numpy()
-        else:
-            img = np.array(image)
         if img.ndim == 2:
             plt.imshow(img, cmap='gray')
         else:
@@ -105,45 +1550,93 @@ class HeladoDeQueso:
         plt.axis('off')
         plt.show()
 
-    def display_image_grid(self, images: Union[List[Any], np.ndarray], title: str = "IMAGE GRID", ncols: int = 5):
+    def display_image_grid(self, images: Union[List[Any], "np.ndarray"], title: str = "IMAGE GRID", ncols: int = 5,
+                           save_path: Optional[str] = None, max_images: Optional[int] = None,
+                           max_side: Optional[int] = None):
         """
-        Muestra un lote de imágenes en una cuadrícula.
+        Muestra un lote de imágenes en una cuadrícula (un único mosaico, no un subplot por imagen).
         :param images: Lista o array de imágenes (N, H, W, C) o (N, H, W).
         :param title: Título de la visualización.
         :param ncols: Número de columnas en la cuadrícula.
+        :param save_path: Si se indica, escribe el mosaico como PNG en esa ruta sin usar matplotlib.
+        :param max_images: Máximo de imágenes a mostrar (equiespaciadas en el lote).
+        :param max_side: Lado máximo de cada miniatura.
         """
-        if not self.active:
+        if save_path is not None:
+            self.render_image_grid(images, save_path, ncols=ncols, max_images=max_images, max_side=max_side)
             return
-        # Convertir a array si es lista
-        if isinstance(images, list):
-            n_images = len(images)
-            images_arr = np.array(images)
-        else:
-            images_arr = images
-            n_images = images_arr.shape[0]
-        ncols = min(ncols, n_images)
-        nrows = int(np.ceil(n_images / ncols))
-        plt.figure(figsize=(ncols * 2, nrows * 2))
+        if self.renderer is not None:
+            if max_images is not None and len(images) > max_images:
+                # Se reduce el lote antes de copiarlo a memoria compartida
+                images = [images[int(i)] for i in _np().linspace(0, len(images) - 1, max_images)]
+            self.renderer.submit('grid', images, title, ncols=ncols, max_side=max_side)
+            return
+        mosaic = make_mosaic(images, ncols=ncols, max_images=max_images, max_side=max_side)
+        plt = _plt()
+        plt.figure(figsize=(min(16, mosaic.shape[1] / 50), min(16, mosaic.shape[0] / 50)))
         plt.suptitle(title)
-        for i in range(n_images):
-            plt.subplot(nrows, ncols, i + 1)
-            img = images_arr[i]
-            if img.ndim == 2:
-                plt.imshow(img, cmap='gray')
-            else:
-                plt.imshow(img)
-            plt.axis('off')
+        plt.imshow(mosaic, cmap='gray' if mosaic.ndim == 2 else None)
+        plt.axis('off')
         plt.tight_layout()
         plt.show()
 
-    def display_model_weights(self, model: Any, layer_name: Optional[str] = None):
+    def render_image_grid(self, images: Any, path: Any = None, ncols: Optional[int] = None,
+                          max_images: Optional[int] = None, max_side: Optional[int] = None,
+                          pad: int = 1) -> Optional[bytes]:
+        """
+        Renderiza un lote como mosaico PNG sin matplotlib ni ventanas (apto para nodos sin pantalla).
+        :param images: Lista o array de imágenes (N, H, W[, C]) o (N, C, H, W).
+        :param path: Ruta o buffer (p. ej. io.BytesIO) donde escribir el PNG; None solo lo devuelve.
+        :param ncols: Columnas del mosaico.
+        :param max_images: Máximo de imágenes (equiespaciadas en el lote).
+        :param max_side: Lado máximo de cada miniatura.
+        :param pad: Píxeles de separación entre imágenes.
+        :return: Bytes del PNG.
+        """
+        mosaic = make_mosaic(images, ncols=ncols, max_images=max_images, max_side=max_side, pad=pad)
+        return _write_png(mosaic, path)
+
+    def _show_heatmap(self, w: "np.ndarray", title: str):
+        """Mapa de calor de una matriz de pesos, en el pool de render si lo hay"""
+        if self.renderer is not None:
+            self.renderer.submit('heatmap', w, title)
+            return
+        plt = _plt()
+        plt.figure()
+        plt.title(title)
+        plt.imshow(w.reshape(w.shape[0], -1), aspect='auto', cmap='viridis')
+        plt.colorbar()
+        plt.show()
+
+    def _print_weight(self, label: str, w: Any, bins: int, heatmaps: bool, max_heatmap_bytes: int):
+        """Resumen, histograma y mapa de calor reducido de un peso"""
+        summary = _weight_summary(w, bins)
+        print(f"\n[WEIGHTS] Capa: {label}")
+        print(f"  Forma: {tuple(w.shape)}  ({summary['size']} parámetros)")
+        if summary['count']:
+            print(f"  Media: {summary['mean']:.4f}, Std: {summary['std']:.4f}, "
+                  f"Min: {summary['min']:.4f}, Max: {summary['max']:.4f}")
+            print(f"  Histograma [{summary['min']:.3g}, {summary['max']:.3g}]: {_sparkline(summary['histogram'])}")
+        if summary['nan'] or summary['inf']:
+            print(f"  ⚠️  NaN: {summary['nan']}  Inf: {summary['inf']}")
+        if heatmaps and len(w.shape) in [2, 4]:
+            matrix, (block_rows, block_cols) = _pooled_heatmap(w, max_heatmap_bytes)
+            pooled = f", media por bloques {block_rows}x{block_cols}" if (block_rows, block_cols) != (1, 1) else ""
+            self._show_heatmap(matrix, f"{label} (heatmap{pooled})")
+
+    def display_model_weights(self, model: Any, layer_name: Optional[str] = None, bins: int = 40,
+                              heatmaps: bool = True, max_heatmap_bytes: int = 256 * 1024):
         """
         Muestra información y visualización de los pesos de un modelo de red neuronal (PyTorch o Keras/TensorFlow).
+        Estadísticas e histogramas se calculan en el dispositivo de cada peso, y los mapas de calor
+        se reducen por bloques antes de copiarse al host.
         :param model: Modelo de red neuronal.
         :param layer_name: Si se especifica, solo muestra esa capa.
+        :param bins: Número de intervalos del histograma.
+        :param heatmaps: Si es False, no dibuja mapas de calor.
+        :param max_heatmap_bytes: Tamaño máximo (float32) de cada mapa de calor que se copia al host.
         """
-        if not self.active:
-            return
+        self.flush()
         # PyTorch
         if 'torch' in sys.modules and hasattr(model, 'named_parameters'):
             try:
@@ -151,19 +1644,11 @@ class HeladoDeQueso:
             except ImportError:
                 print("torch no está instalado.")
                 return
-            for name, param in model.named_parameters():
-                if (layer_name is not None) and (layer_name not in name):
-                    continue
-                w = param.data.cpu().numpy()
-                print(f"\n[WEIGHTS] Capa: {name}")
-                print(f"  Forma: {w.shape}")
-                print(f"  Media: {w.mean():.4f}, Std: {w.std():.4f}")
-                if w.ndim in [2, 4]:
-                    plt.figure()
-                    plt.title(f"{name} (heatmap)")
-                    plt.imshow(w.reshape(w.shape[0], -1), aspect='auto', cmap='viridis')
-                    plt.colorbar()
-                    plt.show()
+            with torch.no_grad():
+                for name, param in model.named_parameters():
+                    if (layer_name is not None) and (layer_name not in name):
+                        continue
+                    self._print_weight(name, param, bins, heatmaps, max_heatmap_bytes)
         # TensorFlow/Keras
         elif 'tensorflow' in sys.modules and hasattr(model, 'layers'):
             try:
@@ -176,18 +1661,8 @@ class HeladoDeQueso:
                     continue
                 if (layer_name is not None) and (layer_name != layer.name):
                     continue
-                weights = layer.get_weights()
-                if not weights:
-                    continue
-                for idx, w in enumerate(weights):
-                    print(f"\n[WEIGHTS] Capa: {layer.name} (peso {idx})")
-                    print(f"  Forma: {w.shape}")
-                    print(f"  Media: {w.mean():.4f}, Std: {w.std():.4f}")
-                    if w.ndim in [2, 4]:
-                        plt.figure()
-                        plt.title(f"{layer.name} (heatmap)")
-                        plt.imshow(w.reshape(w.shape[0], -1), aspect='auto', cmap='viridis')
-                        plt.colorbar()
-                        plt.show()
+                # layer.weights son las variables en su dispositivo; get_weights() las copiaría a numpy
+                for idx, w in enumerate(layer.weights):
+                    self._print_weight(f"{layer.name} (peso {idx})", w, bins, heatmaps, max_heatmap_bytes)
         else:
-            print("Modelo no reconocido. Soporta PyTorch y Keras/TensorFlow.") 
\ No newline at end of file
+            print("Modelo no reconocido. Soporta PyTorch y Keras/TensorFlow.")